@@ -0,0 +1,221 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from classes.combat_system import CombatSystem
+from classes.entity import Entity
+from classes.game import Game
+from classes.headless import DiveBot, HeadlessEngine
+
+# Tunable knobs a sweep can set, mapped to the class attribute that holds them
+SETTINGS = {
+    'difficulty_step': (Game, 'DIFFICULTY_STEP'),
+    'difficulty_cap': (Game, 'DIFFICULTY_CAP'),
+    'xp_growth': (Entity, 'XP_GROWTH'),
+}
+MAX_FIGHT_ROUNDS = 1000
+
+def apply_settings(settings):
+    # Pool workers are reused across tasks, so every task sets all knobs (defaults included)
+    for name, value in settings.items():
+        owner, attribute = SETTINGS[name]
+        setattr(owner, attribute, value)
+
+def create_player(player_level, rng):
+    player = Entity(0, 0, '@', "Player", 100, 10, 0)
+    player.rng = random.Random(rng.getrandbits(64))  # Level-up stat rolls
+    player.initialize_player()
+    for _ in range(player_level - 1):
+        player.gain_xp(player.xp_to_next_level)
+    return player
+
+def run_fights(task):
+    settings, seed, dungeon_level, count, player_level = task
+    apply_settings(settings)
+    rng = random.Random(seed)
+    combat_system = CombatSystem(rng)
+    player = create_player(player_level, rng)
+    enemies = [Game.roll_enemy_stats(dungeon_level, rng) for _ in range(count)]
+    # All fights advance in lockstep, one batched attack per side per round
+    enemy_health = [health for health, _, _ in enemies]
+    enemy_damage = [damage for _, damage, _ in enemies]
+    enemy_defense = [defense for _, _, defense in enemies]
+    player_health = [player.health] * count
+    active = list(range(count))
+    wins = 0
+    time_to_kill = Counter()
+    for rounds in range(1, MAX_FIGHT_ROUNDS + 1):
+        if not active:
+            break
+        size = len(active)
+        damage, defeated = combat_system.resolve_batch(
+            [player.damage] * size, [player.strength] * size,
+            [enemy_defense[fight] for fight in active], [10] * size,
+            [enemy_health[fight] for fight in active])
+        survivors = []
+        for fight, dealt, killed in zip(active, damage, defeated):
+            if killed:
+                wins += 1
+                time_to_kill[rounds] += 1
+            else:
+                enemy_health[fight] -= int(dealt)
+                survivors.append(fight)
+        active = survivors
+        if not active:
+            break
+        size = len(active)
+        damage, defeated = combat_system.resolve_batch(
+            [enemy_damage[fight] for fight in active], [10] * size,
+            [player.defense] * size, [player.dexterity] * size,
+            [player_health[fight] for fight in active])
+        survivors = []
+        for fight, dealt, killed in zip(active, damage, defeated):
+            if not killed:
+                player_health[fight] -= int(dealt)
+                survivors.append(fight)
+        active = survivors
+    return {'level': dungeon_level, 'fights': count, 'wins': wins, 'time_to_kill': time_to_kill}
+
+def run_dives(task):
+    settings, seed, count, max_commands, height, width = task
+    apply_settings(settings)
+    depth_reached = Counter()
+    turns = Counter()
+    for dive in range(count):
+        engine = HeadlessEngine(height, width, seed=f"{seed}:{dive}")
+        engine.run(DiveBot(engine.game).commands(), max_commands=max_commands)
+        depth_reached[engine.game.dungeon_level] += 1
+        turns[engine.game.turn_count] += 1
+    return {'dives': count, 'depth_reached': depth_reached, 'turns': turns}
+
+def split(total, chunk):
+    while total > 0:
+        yield min(chunk, total)
+        total -= chunk
+
+def percentile(counter, fraction):
+    total = sum(counter.values())
+    if not total:
+        return None
+    target = fraction * total
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        if seen >= target:
+            return value
+    return None
+
+def mean(counter):
+    total = sum(counter.values())
+    return sum(value * count for value, count in counter.items()) / total if total else None
+
+def summarize(fight_results, dive_results, max_level):
+    levels = {}
+    for result in fight_results:
+        level = levels.setdefault(result['level'], {'fights': 0, 'wins': 0, 'time_to_kill': Counter()})
+        level['fights'] += result['fights']
+        level['wins'] += result['wins']
+        level['time_to_kill'].update(result['time_to_kill'])
+
+    dives = sum(result['dives'] for result in dive_results)
+    depth_reached = sum((result['depth_reached'] for result in dive_results), Counter())
+    turns = sum((result['turns'] for result in dive_results), Counter())
+
+    summary = {'levels': [], 'dives': dives}
+    for dungeon_level in range(1, max_level + 1):
+        row = {'level': dungeon_level}
+        fights = levels.get(dungeon_level)
+        if fights and fights['fights']:
+            ttk = fights['time_to_kill']
+            row.update(win_rate=fights['wins'] / fights['fights'], ttk_mean=mean(ttk),
+                       ttk_p50=percentile(ttk, 0.5), ttk_p90=percentile(ttk, 0.9))
+        if dives:
+            # Share of dives that got at least this deep
+            row['reached'] = sum(count for depth, count in depth_reached.items() if depth >= dungeon_level) / dives
+        summary['levels'].append(row)
+    if dives:
+        summary.update(depth_mean=mean(depth_reached), depth_p50=percentile(depth_reached, 0.5),
+                       depth_p90=percentile(depth_reached, 0.9), depth_max=max(depth_reached),
+                       turns_mean=mean(turns))
+    return summary
+
+def format_summary(settings, summary):
+    lines = ["Settings: " + ", ".join(f"{name}={value}" for name, value in settings.items())]
+    lines.append(f"{'Level':>5} {'Win %':>7} {'TTK mean':>9} {'p50':>5} {'p90':>5} {'Reached':>8}")
+    for row in summary['levels']:
+        win_rate = f"{row['win_rate'] * 100:.1f}" if 'win_rate' in row else '-'
+        ttk_mean = f"{row['ttk_mean']:.2f}" if row.get('ttk_mean') is not None else '-'
+        reached = f"{row['reached'] * 100:.1f}%" if 'reached' in row else '-'
+        lines.append(f"{row['level']:>5} {win_rate:>7} {ttk_mean:>9} {row.get('ttk_p50') or '-':>5} "
+                     f"{row.get('ttk_p90') or '-':>5} {reached:>8}")
+    if summary['dives']:
+        lines.append(f"Dives: {summary['dives']}  depth mean {summary['depth_mean']:.2f}  p50 {summary['depth_p50']}  "
+                     f"p90 {summary['depth_p90']}  max {summary['depth_max']}  turns mean {summary['turns_mean']:.0f}")
+    return "\n".join(lines)
+
+def parse_sweep(values):
+    # ["difficulty_step=0.05,0.1", "xp_growth=1.5"] -> every combination as a settings dict
+    axes = {name: [getattr(owner, attribute)] for name, (owner, attribute) in SETTINGS.items()}
+    for value in values:
+        name, _, options = value.partition('=')
+        if name not in SETTINGS:
+            raise SystemExit(f"Unknown setting '{name}'; choose from {', '.join(SETTINGS)}")
+        axes[name] = [float(option) for option in options.split(',')]
+    names = list(axes)
+    return [dict(zip(names, combination)) for combination in itertools.product(*axes.values())]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo balance runner for combat, spawning and the XP curve.")
+    parser.add_argument('--fights', type=int, default=100000, help="fights per dungeon level and setting")
+    parser.add_argument('--dives', type=int, default=200, help="full bot dives per setting")
+    parser.add_argument('--levels', type=int, default=10, help="deepest dungeon level to simulate fights for")
+    parser.add_argument('--player-level', type=int, default=1)
+    parser.add_argument('--max-commands', type=int, default=5000, help="command budget per dive")
+    parser.add_argument('--sweep', action='append', default=[], metavar='NAME=V1,V2',
+                        help=f"setting values to sweep ({', '.join(SETTINGS)})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk', type=int, default=20000, help="fights per worker task")
+    parser.add_argument('--dive-chunk', type=int, default=10, help="dives per worker task")
+    parser.add_argument('--height', type=int, default=21)
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    sweep = parse_sweep(args.sweep)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        pending = []
+        for index, settings in enumerate(sweep):
+            # Every task gets its own seed, so results do not depend on how tasks land on workers
+            fight_tasks = [
+                (settings, f"{args.seed}:{index}:fights:{level}:{number}", level, count, args.player_level)
+                for level in range(1, args.levels + 1)
+                for number, count in enumerate(split(args.fights, args.chunk))
+            ]
+            dive_tasks = [
+                (settings, f"{args.seed}:{index}:dives:{number}", count, args.max_commands, args.height, args.width)
+                for number, count in enumerate(split(args.dives, args.dive_chunk))
+            ]
+            pending.append((settings,
+                            executor.map(run_fights, fight_tasks),
+                            executor.map(run_dives, dive_tasks)))
+        results = [(settings, summarize(list(fights), list(dives), args.levels))
+                   for settings, fights, dives in pending]
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps([{'settings': settings, 'summary': summary} for settings, summary in results], indent=2))
+    else:
+        for settings, summary in results:
+            print(format_summary(settings, summary))
+            print()
+        print(f"Elapsed: {elapsed:.2f}s on {args.workers} workers")
+
+if __name__ == '__main__':
+    main()
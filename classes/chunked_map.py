@@ -0,0 +1,274 @@
+import random
+import struct
+import zlib
+
+from classes.tile_map import TileMap, TILE_CHARS, TILE_IDS, PASSABLE, TRANSPARENT, COST
+
+CHUNK_SIZE = 32
+LOAD_RADIUS = 1  # Chunks (Chebyshev distance) around the player that are kept loaded
+UNLOAD_RADIUS = 2  # Chunks farther away than this are dropped, or compressed if they were edited
+WORLD_HEADER = struct.Struct('<IIHQII')  # width, height, chunk size, seed, visited and edited chunk counts
+CHUNK_KEY = struct.Struct('<HH')
+EDITED_CHUNK = struct.Struct('<HHI')  # chunk x, chunk y, compressed size
+
+class Chunk:
+    def __init__(self, chunk_x, chunk_y, tile_map, rooms):
+        self.chunk_x = chunk_x
+        self.chunk_y = chunk_y
+        self.map = tile_map
+        self.rooms = rooms  # In world coordinates; empty for chunks restored from compressed tiles
+
+    @property
+    def key(self):
+        return (self.chunk_x, self.chunk_y)
+
+class ChunkedMap:
+    # A world split into square chunks that are generated from their own seed the first time they
+    # are needed. Chunks far from the player are dropped (they regenerate identically) or, if edited,
+    # kept compressed, so memory and generation time follow the explored area, not the world size.
+    # Reads from a chunk that is not loaded load it on the spot.
+    def __init__(self, width, height, seed, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks_x = max(1, -(-width // chunk_size))
+        self.chunks_y = max(1, -(-height // chunk_size))
+        # Worlds are rounded up to whole chunks
+        self.width = self.chunks_x * chunk_size
+        self.height = self.chunks_y * chunk_size
+        self.seed = seed
+        self.chunks = {}
+        self.packed = {}  # Edited chunks that were unloaded, as compressed tiles
+        self.edited = set()
+        self.visited = set()  # Every chunk generated at least once
+        self.new_chunks = []  # Chunks generated for the first time that the game has not populated yet
+        self.version = 0
+
+    def chunk(self, chunk_x, chunk_y):
+        chunk = self.chunks.get((chunk_x, chunk_y))
+        if chunk is None:
+            chunk = self.load_chunk(chunk_x, chunk_y)
+        return chunk
+
+    def load_chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        data = self.packed.pop(key, None)
+        if data is not None and key in self.visited:
+            size = self.chunk_size
+            chunk = Chunk(chunk_x, chunk_y, TileMap(size, size, tiles=bytearray(zlib.decompress(data))), [])
+        else:
+            chunk = self.generate_chunk(chunk_x, chunk_y)
+            if data is not None:
+                # Edited before it was ever reached, like the chunk with the down stairs; it still gets
+                # its rooms and is populated now
+                chunk.map.tiles[:] = zlib.decompress(data)
+        self.chunks[key] = chunk
+        self.version += 1
+        return chunk
+
+    def unload_chunk(self, key):
+        chunk = self.chunks.pop(key)
+        if key in self.edited:
+            self.packed[key] = zlib.compress(bytes(chunk.map.tiles))
+        self.version += 1
+
+    def load_around(self, x, y):
+        # Loads the chunks near (x, y) and unloads far ones
+        center_x, center_y = x // self.chunk_size, y // self.chunk_size
+        for key in [key for key in self.chunks
+                    if max(abs(key[0] - center_x), abs(key[1] - center_y)) > UNLOAD_RADIUS]:
+            self.unload_chunk(key)
+        for chunk_y in range(max(0, center_y - LOAD_RADIUS), min(self.chunks_y, center_y + LOAD_RADIUS + 1)):
+            for chunk_x in range(max(0, center_x - LOAD_RADIUS), min(self.chunks_x, center_x + LOAD_RADIUS + 1)):
+                if (chunk_x, chunk_y) not in self.chunks:
+                    self.load_chunk(chunk_x, chunk_y)
+
+    def release(self, key):
+        # Unloads a chunk that was only generated to be edited, so it counts as unvisited again and
+        # is populated when the player first gets near it
+        self.unload_chunk(key)
+        self.visited.discard(key)
+        self.new_chunks = [chunk for chunk in self.new_chunks if chunk.key != key]
+
+    def take_new_chunks(self):
+        new_chunks, self.new_chunks = self.new_chunks, []
+        return new_chunks
+
+    def generate_chunk(self, chunk_x, chunk_y):
+        size = self.chunk_size
+        rng = random.Random(f"{self.seed}:chunk:{chunk_x}:{chunk_y}")
+        tile_map = TileMap(size, size)
+        rooms = []
+        for _ in range(rng.randint(2, 4)):
+            w, h = rng.randint(5, 8), rng.randint(3, 6)
+            x, y = rng.randint(1, size - w - 1), rng.randint(1, size - h - 1)
+            tile_map.fill_rect(x, y, w, h, '.')
+            rooms.append((x, y, w, h))
+        centers = [(x + w // 2, y + h // 2) for x, y, w, h in rooms]
+        for start, end in zip(centers, centers[1:]):
+            self.carve_corridor(tile_map, start, end)
+        # Every chunk reaches every neighbour through one gate cell on the shared edge; both sides
+        # derive the gate from the edge, so corridors meet without looking at the other chunk
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            if 0 <= chunk_x + dx < self.chunks_x and 0 <= chunk_y + dy < self.chunks_y:
+                gate = self.gate(chunk_x, chunk_y, dx, dy)
+                local = (gate[0] - chunk_x * size, gate[1] - chunk_y * size)
+                self.carve_corridor(tile_map, rng.choice(centers), local, horizontal_first=bool(dy))
+        origin_x, origin_y = chunk_x * size, chunk_y * size
+        chunk = Chunk(chunk_x, chunk_y, tile_map, [(x + origin_x, y + origin_y, w, h) for x, y, w, h in rooms])
+        if chunk.key not in self.visited:
+            self.visited.add(chunk.key)
+            self.new_chunks.append(chunk)
+        return chunk
+
+    def carve_corridor(self, tile_map, start, end, horizontal_first=True):
+        (x1, y1), (x2, y2) = start, end
+        if horizontal_first:
+            tile_map.fill_row(y1, x1, x2, '.')
+            tile_map.fill_column(x2, y1, y2, '.')
+        else:
+            tile_map.fill_column(x1, y1, y2, '.')
+            tile_map.fill_row(y2, x1, x2, '.')
+
+    def gate(self, chunk_x, chunk_y, dx, dy):
+        # World cell on this chunk's border where it connects to the neighbour in direction (dx, dy)
+        size = self.chunk_size
+        if dx:
+            edge_x = chunk_x + (dx > 0)
+            offset = random.Random(f"{self.seed}:gate:v:{edge_x}:{chunk_y}").randint(2, size - 3)
+            return (edge_x * size - (dx > 0), chunk_y * size + offset)
+        edge_y = chunk_y + (dy > 0)
+        offset = random.Random(f"{self.seed}:gate:h:{chunk_x}:{edge_y}").randint(2, size - 3)
+        return (chunk_x * size + offset, edge_y * size - (dy > 0))
+
+    def waypoint(self, x, y, goal_x, goal_y):
+        # Where to head for a goal that may lie in chunks that are not loaded yet: the goal itself
+        # once its chunk is loaded, otherwise the gate cell just past the border towards it
+        if (goal_x // self.chunk_size, goal_y // self.chunk_size) in self.chunks:
+            return goal_x, goal_y
+        chunk_x, chunk_y = x // self.chunk_size, y // self.chunk_size
+        dx = (goal_x // self.chunk_size > chunk_x) - (goal_x // self.chunk_size < chunk_x)
+        dy = 0 if dx else (goal_y // self.chunk_size > chunk_y) - (goal_y // self.chunk_size < chunk_y)
+        gate_x, gate_y = self.gate(chunk_x, chunk_y, dx, dy)
+        return gate_x + dx, gate_y + dy
+
+    def room_center(self, chunk_x, chunk_y):
+        x, y, w, h = self.chunk(chunk_x, chunk_y).rooms[0]
+        return x + w // 2, y + h // 2
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def tile_id(self, x, y):
+        size = self.chunk_size
+        chunk = self.chunks.get((x // size, y // size)) or self.chunk(x // size, y // size)
+        return chunk.map.tiles[(y % size) * size + x % size]
+
+    def get(self, x, y):
+        return TILE_CHARS[self.tile_id(x, y)]
+
+    def set(self, x, y, char):
+        size = self.chunk_size
+        chunk = self.chunk(x // size, y // size)
+        chunk.map.tiles[(y % size) * size + x % size] = TILE_IDS[char]
+        self.edited.add(chunk.key)
+        self.version += 1
+
+    def is_passable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and PASSABLE[self.tile_id(x, y)] == 1
+
+    def is_transparent(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and TRANSPARENT[self.tile_id(x, y)] == 1
+
+    def cost(self, x, y):
+        return COST[self.tile_id(x, y)]
+
+    def row_ids(self, y, x, width):
+        # Tile ids of part of a row; chunks that are not loaded read as void rather than being loaded
+        size = self.chunk_size
+        parts = []
+        while width > 0:
+            run = min(width, size - x % size)
+            chunk = self.chunks.get((x // size, y // size))
+            if chunk is None:
+                parts.append(bytes(run))
+            else:
+                start = (y % size) * size + x % size
+                parts.append(chunk.map.tiles[start:start + run])
+            x += run
+            width -= run
+        return b''.join(parts)
+
+    def active_bounds(self):
+        # Bounding box of the loaded chunks as (x, y, width, height); pathfinding grids and random
+        # spawns stay inside it
+        if not self.chunks:
+            return (0, 0, 0, 0)
+        size = self.chunk_size
+        xs = [key[0] for key in self.chunks]
+        ys = [key[1] for key in self.chunks]
+        return (min(xs) * size, min(ys) * size, (max(xs) - min(xs) + 1) * size, (max(ys) - min(ys) + 1) * size)
+
+    def passable_region(self, x, y, width, height):
+        # Passability mask of a chunk-aligned area; chunks that are not loaded count as walls
+        return self.region_mask(x, y, width, height, TileMap.passable_mask)
+
+    def transparent_region(self, x, y, width, height):
+        return self.region_mask(x, y, width, height, TileMap.transparent_mask)
+
+    def region_mask(self, x, y, width, height, chunk_mask):
+        size = self.chunk_size
+        mask = bytearray(width * height)
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            left, top = chunk_x * size - x, chunk_y * size - y
+            if not (0 <= left < width and 0 <= top < height):
+                continue
+            tiles = chunk_mask(chunk.map)
+            for row in range(size):
+                start = (top + row) * width + left
+                mask[start:start + size] = tiles[row * size:(row + 1) * size]
+        return mask
+
+    def pack(self):
+        # Everything needed to rebuild the world: its seed, which chunks were populated, and the
+        # edited chunks' tiles
+        edited = dict(self.packed)
+        for key in self.edited:
+            if key in self.chunks:
+                edited[key] = zlib.compress(bytes(self.chunks[key].map.tiles))
+        parts = [WORLD_HEADER.pack(self.width, self.height, self.chunk_size, self.seed, len(self.visited), len(edited))]
+        parts.extend(CHUNK_KEY.pack(*key) for key in sorted(self.visited))
+        for key in sorted(edited):
+            parts.append(EDITED_CHUNK.pack(*key, len(edited[key])) + edited[key])
+        return b''.join(parts)
+
+    @classmethod
+    def unpack(cls, data):
+        width, height, chunk_size, seed, visited_count, edited_count = WORLD_HEADER.unpack_from(data, 0)
+        world = cls(width, height, seed, chunk_size)
+        offset = WORLD_HEADER.size
+        world.visited = set(CHUNK_KEY.iter_unpack(data[offset:offset + visited_count * CHUNK_KEY.size]))
+        offset += visited_count * CHUNK_KEY.size
+        for _ in range(edited_count):
+            chunk_x, chunk_y, length = EDITED_CHUNK.unpack_from(data, offset)
+            offset += EDITED_CHUNK.size
+            world.packed[(chunk_x, chunk_y)] = data[offset:offset + length]
+            world.edited.add((chunk_x, chunk_y))
+            offset += length
+        return world
+
+def generate_world(width, height, rng):
+    # Same result shape as MapGenerator.generate_level: the map, its rooms (of the chunks generated so
+    # far) and the up and down stairs, placed in two different random chunks
+    world = ChunkedMap(width, height, rng.getrandbits(63))
+    chunk_count = world.chunks_x * world.chunks_y
+    start = rng.randrange(chunk_count)
+    end = (start + rng.randrange(1, chunk_count)) % chunk_count if chunk_count > 1 else start
+    up_x, up_y = world.room_center(*divmod(start, world.chunks_x)[::-1])
+    down_x, down_y = world.room_center(*divmod(end, world.chunks_x)[::-1])
+    world.set(up_x, up_y, '<')
+    world.set(down_x, down_y, '>')
+    # Only the arrival chunk stays loaded; the down stairs' chunk keeps its edit in packed form
+    start_key = (up_x // world.chunk_size, up_y // world.chunk_size)
+    for key in [key for key in world.chunks if key != start_key]:
+        world.release(key)
+    rooms = [room for chunk in world.chunks.values() for room in chunk.rooms]
+    return world, rooms, up_x, up_y, down_x, down_y
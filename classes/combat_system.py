@@ -1,39 +1,127 @@
 import random
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DICE_BUFFER_SIZE = 4096
+
+class RollBuffer:
+    # Rolls are pre-drawn in fixed-size blocks and handed out in order, one at a time or in
+    # batches; refilling in fixed blocks keeps the sequence independent of how it is consumed
+    def __init__(self, draw, size=DICE_BUFFER_SIZE):
+        self.draw = draw
+        self.size = size
+        self.values = []
+        self.position = 0
+
+    def next(self):
+        if self.position >= len(self.values):
+            self.values = self.draw(self.size)
+            self.position = 0
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+    def take(self, count):
+        values = []
+        while count > 0:
+            if self.position >= len(self.values):
+                self.values = self.draw(self.size)
+                self.position = 0
+            end = min(len(self.values), self.position + count)
+            values.extend(self.values[self.position:end])
+            count -= end - self.position
+            self.position = end
+        if numpy is not None:
+            return numpy.array(values, dtype=numpy.int64)
+        return values
+
+class CombatDice:
+    # Attack rolls and damage variance come from separate streams, so a batch may draw all of
+    # its attack rolls before any variance and still match one-at-a-time resolution. The rolls
+    # never come from NumPy, so a seed gives the same fights whether or not it is installed.
+    def __init__(self, rng=random):
+        attack_rng = random.Random(rng.getrandbits(64))
+        variance_rng = random.Random(rng.getrandbits(64))
+        self.attack_rolls = RollBuffer(lambda size: attack_rng.choices(range(1, 21), k=size))
+        self.damage_variance = RollBuffer(lambda size: variance_rng.choices(range(-2, 3), k=size))
+
 class CombatSystem:
-    @staticmethod
-    def combat(attacker, defender, messages):
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.dice = CombatDice(rng)
+
+    def combat(self, attacker, defender, messages):
         base_damage = attacker.damage
-        attack_roll = random.randint(1, 20) + max(0, (attacker.strength - 10) // 2)
+        attack_roll = self.dice.attack_rolls.next() + max(0, (attacker.strength - 10) // 2)
         defense_value = 10 + defender.defense + max(0, (defender.dexterity - 10) // 2)
 
         if attack_roll >= defense_value:
-            damage = max(1, base_damage + random.randint(-2, 2))
+            damage = max(1, base_damage + self.dice.damage_variance.next())
             defender.health -= damage
-            messages.append(f"{attacker.name} hits {defender.name} for {damage} damage.")
-            
+            if messages is not None:
+                messages.append(f"{attacker.name} hits {defender.name} for {damage} damage.")
+
             if defender.health <= 0:
-                messages.append(f"{defender.name} is defeated!")
+                if messages is not None:
+                    messages.append(f"{defender.name} is defeated!")
                 return True  # Enemy defeated
-        else:
+        elif messages is not None:
             messages.append(f"{attacker.name} misses {defender.name}.")
-        
+
         return False  # Enemy not defeated
 
-    def create_random_item(self):
-        from classes.item_loader import all_items
-        import random
-        return random.choice(all_items)
+    def resolve_batch(self, attack_damage, attack_strength, defense, defense_dexterity, health,
+                      messages=None, attacker_names=None, defender_names=None):
+        # Resolves one independent attack per row and returns (damage, defeated); rows are
+        # resolved in order, so the same dice give the same outcomes as calling combat() per row.
+        # Messages are only built when a list and names are given.
+        count = len(attack_damage)
+        rolls = self.dice.attack_rolls.take(count)
+        if numpy is not None:
+            attack_damage = numpy.asarray(attack_damage)
+            attack_bonus = numpy.maximum(0, (numpy.asarray(attack_strength) - 10) // 2)
+            defense_value = 10 + numpy.asarray(defense) + numpy.maximum(0, (numpy.asarray(defense_dexterity) - 10) // 2)
+            hit = rolls + attack_bonus >= defense_value
+            variance = self.dice.damage_variance.take(int(hit.sum()))
+            damage = numpy.zeros(count, dtype=numpy.int64)
+            damage[hit] = numpy.maximum(1, attack_damage[hit] + variance)
+            defeated = hit & (numpy.asarray(health) - damage <= 0)
+        else:
+            hit = [
+                roll + max(0, (strength - 10) // 2) >= 10 + defense_bonus + max(0, (dexterity - 10) // 2)
+                for roll, strength, defense_bonus, dexterity in zip(rolls, attack_strength, defense, defense_dexterity)
+            ]
+            variance = iter(self.dice.damage_variance.take(sum(hit)))
+            damage = [max(1, base + next(variance)) if landed else 0 for base, landed in zip(attack_damage, hit)]
+            defeated = [landed and hp - dealt <= 0 for landed, hp, dealt in zip(hit, health, damage)]
 
-    def player_attack_enemy(self, player, enemy, messages):
+        if messages is not None and attacker_names is not None and defender_names is not None:
+            for attacker, defender, landed, dealt, killed in zip(attacker_names, defender_names, hit, damage, defeated):
+                if landed:
+                    messages.append(f"{attacker} hits {defender} for {dealt} damage.")
+                    if killed:
+                        messages.append(f"{defender} is defeated!")
+                else:
+                    messages.append(f"{attacker} misses {defender}.")
+        return damage, defeated
+
+    def create_random_item(self, dungeon_level=1):
+        from classes.item_loader import catalog
+        return catalog.random_item(self.rng, dungeon_level)
+
+    def player_attack_enemy(self, player, enemy, messages, dungeon_level=1):
         defeated = self.combat(player, enemy, messages)
         if defeated:
             messages.append(f"You defeated {enemy.name}!")
             player.gain_xp(20 + enemy.level * 5)
-            
+
             # 5% chance to drop a random item
-            if random.random() < 0.05:
-                dropped_item = self.create_random_item()
-                dropped_item.x, dropped_item.y = enemy.x, enemy.y
+            if self.rng.random() < 0.05:
+                dropped_item = self.create_random_item(dungeon_level)
+                if dropped_item is not None:  # None when nothing in the catalog can drop
+                    dropped_item.set_position(enemy.x, enemy.y)
                 return dropped_item
-        return None
\ No newline at end of file
+        return None
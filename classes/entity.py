@@ -1,74 +1,33 @@
 import random
-from collections import Counter
+from classes.inventory import Inventory
 from classes.item import Equipment, Item
-from classes.item_loader import all_consumables, all_equipment
 
-class Item:
-    def __init__(self, name, char, effect, duration=None):
-        self.name = name
-        self.char = char
-        self.effect = effect
-        self.duration = duration
-        self.x = None
-        self.y = None
-        self.quantity = 1
-        self.level = 1
-        self.xp = 0
-        self.xp_to_next_level = 100        
-        self.strength = 10
-        self.dexterity = 10
-        self.constitution = 10
-        self.intelligence = 10
-        self.willpower = 10
-        self.charisma = 10
-        self.appearance = 10
-        self.perception = 10
-        self.speed = 100
-        self.max_mana = 10
-        self.mana = 10
-        self.max_psi = 10
-        self.psi = 10        
-        self.money = 0
-        self.deity = "None"
-        self.birth = "Unknown"
-        self.month = "Unknown"
-        self.day = "Unknown"
-        self.age = 0
-
-    def __eq__(self, other):
-        if isinstance(other, Item):
-            return self.name == other.name
-        return False
-
-    def __hash__(self):
-        return hash(self.name)
+# Equipment slot keys and names, in the order the equipment screen lists them
+EQUIPMENT_SLOTS = (
+    ('a', 'weapon'), ('b', 'missile weapon'), ('c', 'helmet'), ('d', 'amulet'), ('e', 'shield'),
+    ('f', 'armor'), ('g', 'cloak'), ('h', 'girdle'), ('i', 'gauntlets'), ('j', 'boots'),
+    ('k', 'ring (right)'), ('l', 'ring (left)'), ('m', 'bracers'),
+)
+SLOT_KEYS_BY_NAME = {name: key for key, name in EQUIPMENT_SLOTS}
 
 class Entity:
+    spatial_layer = 'entities'
+    # Each level needs this much more XP than the last
+    XP_GROWTH = 1.5
+
     def __init__(self, x, y, char, name, health, damage, defense):
-        self.x = x
-        self.y = y
+        self.spatial_index = None
+        self.rng = random  # Games hand the player its own stream
+        self._x = x
+        self._y = y
         self.char = char
         self.name = name
         self.max_health = health
         self.health = health
         self.base_damage = damage
         self.base_defense = defense
-        self.inventory = Counter()
-        self.equipment = {
-            'a': {'name': 'weapon', 'item': None},
-            'b': {'name': 'missile weapon', 'item': None},
-            'c': {'name': 'helmet', 'item': None},
-            'd': {'name': 'amulet', 'item': None},
-            'e': {'name': 'shield', 'item': None},
-            'f': {'name': 'armor', 'item': None},
-            'g': {'name': 'cloak', 'item': None},
-            'h': {'name': 'girdle', 'item': None},
-            'i': {'name': 'gauntlets', 'item': None},
-            'j': {'name': 'boots', 'item': None},
-            'k': {'name': 'ring (right)', 'item': None},
-            'l': {'name': 'ring (left)', 'item': None},
-            'm': {'name': 'bracers', 'item': None},
-        }
+        self.inventory = Inventory()
+        self.equipment = {key: {'name': name, 'item': None} for key, name in EQUIPMENT_SLOTS}
         self.level = 1
         self.xp = 0
         self.xp_to_next_level = 100        
@@ -91,25 +50,61 @@ class Entity:
         self.month = "Unknown"
         self.day = "Unknown"
         self.age = 0
+        self.awake = False  # Monsters stay put until they first see the player
+        self.stats = None  # Cached (damage, defense)
+        self.timers = None  # The clock boosts expire on; the game's, for the player and monsters
     
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self.set_position(value, self._y)
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self.set_position(self._x, value)
+
+    def set_position(self, x, y):
+        old_position = (self._x, self._y)
+        self._x, self._y = x, y
+        if self.spatial_index is not None:
+            self.spatial_index.move(self, old_position)
+
     @property
     def damage(self):
-        weapon = next((slot['item'] for slot in self.equipment.values() if slot['name'] == 'weapon'), None)
-        weapon_bonus = weapon.stat_boost if weapon else 0
-        strength_bonus = max(0, (self.strength - 10) // 2)  # +1 for every 2 points above 10
-        return self.base_damage + weapon_bonus + strength_bonus
+        return self.derived_stats()[0]
 
     @property
     def defense(self):
-        armor_bonus = sum(slot['item'].stat_boost for slot in self.equipment.values() if slot['item'] and slot['name'] != 'weapon')
-        dexterity_bonus = max(0, (self.dexterity - 10) // 2)  # +1 for every 2 points above 10
-        return self.base_defense + armor_bonus + dexterity_bonus
+        return self.derived_stats()[1]
+
+    def derived_stats(self):
+        # Only gear, levels and boosts change these, and each of those calls invalidate_stats()
+        if self.stats is None:
+            weapon = self.equipment[SLOT_KEYS_BY_NAME['weapon']]['item']
+            weapon_bonus = weapon.stat_boost if weapon else 0
+            strength_bonus = max(0, (self.get_stat('strength') - 10) // 2)  # +1 for every 2 points above 10
+            armor_bonus = sum(slot['item'].stat_boost for slot in self.equipment.values() if slot['item'] and slot['name'] != 'weapon')
+            dexterity_bonus = max(0, (self.get_stat('dexterity') - 10) // 2)  # +1 for every 2 points above 10
+            self.stats = (self.base_damage + weapon_bonus + strength_bonus,
+                          self.base_defense + armor_bonus + dexterity_bonus)
+        return self.stats
+
+    def invalidate_stats(self):
+        self.stats = None
 
     def equip(self, item, slot_key):
         slot = self.equipment[slot_key]
         if isinstance(item, Equipment) and item.slot == slot['name']:
             old_item = slot['item']
             slot['item'] = item
+            self.invalidate_stats()
             if old_item:
                 self.add_item(old_item)
             if item in self.inventory:
@@ -128,24 +123,14 @@ class Entity:
         return f"You don't have {item.name}"
 
     def add_item(self, item):
-        # Check if an item with the same name already exists
-        existing_item = next((i for i in self.inventory if i.name == item.name), None)
-        if existing_item:
-            self.inventory[existing_item] += 1
-        else:
-            self.inventory[item] = 1
+        # Items of the same name share a stack
+        self.inventory.add(item)
 
     def remove_item(self, item):
-        existing_item = next((i for i in self.inventory if i.name == item.name), None)
-        if existing_item and self.inventory[existing_item] > 0:
-            self.inventory[existing_item] -= 1
-            if self.inventory[existing_item] == 0:
-                del self.inventory[existing_item]
-            return True
-        return False
+        return self.inventory.remove(item)
 
     def get_inventory_items(self):
-        return list(self.inventory.items())
+        return self.inventory.items()
 
     def move(self, dx, dy, game):
         speed_multiplier = 1
@@ -157,7 +142,7 @@ class Entity:
         for _ in range(moves):
             new_x, new_y = self.x + dx, self.y + dy
             if game.is_valid_move(new_x, new_y):
-                self.x, self.y = new_x, new_y
+                self.set_position(new_x, new_y)
             else:
                 break
         return True
@@ -170,7 +155,7 @@ class Entity:
     def level_up(self):
         self.level += 1
         self.xp -= self.xp_to_next_level
-        self.xp_to_next_level = int(self.xp_to_next_level * 1.5)
+        self.xp_to_next_level = int(self.xp_to_next_level * self.XP_GROWTH)
         self.max_health += 10
         self.health = self.max_health
         self.base_damage += 2
@@ -179,24 +164,26 @@ class Entity:
         # Increase stats randomly
         stats = ['strength', 'dexterity', 'constitution', 'intelligence', 'willpower', 'charisma', 'appearance', 'perception']
         for stat in stats:
-            setattr(self, stat, getattr(self, stat) + random.randint(1, 2))
+            setattr(self, stat, getattr(self, stat) + self.rng.randint(1, 2))
         
-        self.speed += random.randint(1, 2)
+        self.speed += self.rng.randint(1, 2)
+        self.invalidate_stats()
 
     def initialize_player(self):
+        from classes.item_loader import catalog
         # Add two healing potions to the player's inventory
-        health_potion = next((item for item in all_consumables if item.name == "Health Potion"), None)
+        health_potion = catalog.item("Health Potion")
         if health_potion:
             self.add_item(health_potion)
             self.add_item(health_potion)
 
         # Equip the player with a dagger
-        dagger = next((item for item in all_equipment if item.name == "Dagger"), None)
+        dagger = catalog.item("Dagger")
         if dagger:
             self.equip(dagger, 'a')  # 'a' is the slot for weapon
 
         # Equip the player with leather armor
-        leather_armor = next((item for item in all_equipment if item.name == "Leather Armor"), None)
+        leather_armor = catalog.item("Leather Armor")
         if leather_armor:
             self.equip(leather_armor, 'f')  # 'f' is the slot for armor
 
@@ -218,14 +205,23 @@ class Entity:
     def apply_temporary_boost(self, stat, value, duration):
         if not hasattr(self, 'temporary_boosts'):
             self.temporary_boosts = {}
-        self.temporary_boosts[stat] = {'value': value, 'duration': duration}
+        if self.timers is None:
+            # A clock nobody advances would keep the boost forever
+            raise ValueError(f"{self.name} has no turn timers to expire a boost on")
+        # A new boost of the same stat replaces the old one along with its expiry
+        old_boost = self.temporary_boosts.get(stat)
+        if old_boost:
+            self.timers.cancel(old_boost['timer'])
+        timer = self.timers.schedule(duration, self.expire_boost, stat)
+        self.temporary_boosts[stat] = {'value': value, 'timer': timer}
+        self.invalidate_stats()
+
+    def expire_boost(self, stat):
+        del self.temporary_boosts[stat]
+        self.invalidate_stats()
 
-    def update_temporary_boosts(self):
-        if hasattr(self, 'temporary_boosts'):
-            for stat, boost in list(self.temporary_boosts.items()):
-                boost['duration'] -= 1
-                if boost['duration'] <= 0:
-                    del self.temporary_boosts[stat]
+    def boost_turns_left(self, stat):
+        return self.timers.turns_left(self.temporary_boosts[stat]['timer'])
 
     def get_stat(self, stat):
         base_value = getattr(self, stat)
@@ -238,20 +234,23 @@ class Entity:
         return f"You restored {amount} mana."
 
     def equip_item(self, item):
-        for slot_key, slot in self.equipment.items():
-            if slot['name'] == item.slot:
-                if slot['item']:
-                    self.add_item(slot['item'])  # Add currently equipped item back to inventory
-                slot['item'] = item
-                self.remove_item(item)
-                return f"Equipped {item.name} in {slot['name']} slot."
-        return f"No suitable slot found for {item.name}."
+        slot_key = SLOT_KEYS_BY_NAME.get(item.slot)
+        if slot_key is None:
+            return f"No suitable slot found for {item.name}."
+        slot = self.equipment[slot_key]
+        if slot['item']:
+            self.add_item(slot['item'])  # Add currently equipped item back to inventory
+        slot['item'] = item
+        self.remove_item(item)
+        self.invalidate_stats()
+        return f"Equipped {item.name} in {slot['name']} slot."
 
     def unequip_item(self, slot_key):
         slot = self.equipment.get(slot_key)
         if slot and slot['item']:
             self.add_item(slot['item'])
             slot['item'] = None
+            self.invalidate_stats()
             return f"Unequipped item from {slot['name']} slot."
         return "No item to unequip in this slot."
 
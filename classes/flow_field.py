@@ -0,0 +1,62 @@
+from collections import deque
+
+from classes.pathfinding import PassabilityGrid
+
+class FlowField:
+    def __init__(self):
+        self.grid = None
+        self.goal = None
+        self.distances = []
+        self.frontier = deque()
+
+    def update(self, game_map, goal_x, goal_y):
+        # The field only depends on the map and the goal, so it is kept as long as neither changes
+        if self.grid is not None and self.grid.is_current(game_map) and self.goal == (goal_x, goal_y):
+            return
+        if self.grid is None or not self.grid.is_current(game_map):
+            self.grid = PassabilityGrid(game_map)
+        self.goal = (goal_x, goal_y)
+        self.distances = [-1] * len(self.grid.cells)
+        self.frontier = deque()
+        if self.grid.in_bounds(goal_x, goal_y):
+            goal_index = self.grid.encode(goal_x, goal_y)
+            self.distances[goal_index] = 0
+            self.frontier.append(goal_index)
+
+    def distance(self, x, y):
+        if self.grid is None or not self.grid.in_bounds(x, y):
+            return None
+        index = self.grid.encode(x, y)
+        if self.distances[index] < 0 and self.frontier:
+            self._expand_until(index)
+        distance = self.distances[index]
+        return distance if distance >= 0 else None
+
+    def next_step(self, x, y):
+        grid = self.grid
+        if grid is None or not grid.in_bounds(x, y):
+            return None
+        index = grid.encode(x, y)
+        distances = self.distances
+        if distances[index] < 0 and self.frontier:
+            self._expand_until(index)
+        distance = distances[index]
+        if distance <= 0:
+            return None
+        # Breadth-first order guarantees every cell one step closer is already settled
+        for offset in grid.offsets:
+            if distances[index + offset] == distance - 1:
+                return grid.decode(index + offset)
+        return None
+
+    def _expand_until(self, target):
+        # The search is resumed lazily, so cells beyond the farthest enemy are never visited
+        distances, cells, offsets, frontier = self.distances, self.grid.cells, self.grid.offsets, self.frontier
+        while frontier and distances[target] < 0:
+            current = frontier.popleft()
+            next_distance = distances[current] + 1
+            for offset in offsets:
+                neighbor = current + offset
+                if distances[neighbor] < 0 and cells[neighbor]:
+                    distances[neighbor] = next_distance
+                    frontier.append(neighbor)
@@ -0,0 +1,157 @@
+import struct
+
+from classes.pathfinding import TransparencyGrid
+
+FOV_RADIUS = 8
+# Explored cells are kept in square blocks of bits, so huge chunked worlds only pay for what was seen
+BLOCK_SHIFT = 5
+BLOCK_SIZE = 1 << BLOCK_SHIFT
+BLOCK_MASK = BLOCK_SIZE - 1
+ROW_BYTES = BLOCK_SIZE // 8
+BLOCK_BYTES = BLOCK_SIZE * ROW_BYTES
+BLOCK_KEY = struct.Struct('<HH')
+# Each bitset byte spelled out as eight 0/1 bytes, to turn bit rows into masks without a loop per cell
+EXPANDED_BITS = [bytes((value >> bit) & 1 for bit in range(8)) for value in range(256)]
+# Shadowcasting scans four quadrants; each maps (row depth, column) to a map offset:
+# column step (dx, dy), then depth step (dx, dy)
+QUADRANTS = ((1, 0, 0, -1), (1, 0, 0, 1), (0, 1, 1, 0), (0, 1, -1, 0))
+
+class ExploredTiles:
+    # Every cell of a level the player has seen, as bitsets per block
+    def __init__(self):
+        self.blocks = {}
+
+    def mark_all(self, cells):
+        blocks = self.blocks
+        for x, y in cells:
+            block = blocks.get((x >> BLOCK_SHIFT, y >> BLOCK_SHIFT))
+            if block is None:
+                block = blocks[x >> BLOCK_SHIFT, y >> BLOCK_SHIFT] = bytearray(BLOCK_BYTES)
+            index = ((y & BLOCK_MASK) << BLOCK_SHIFT) | (x & BLOCK_MASK)
+            block[index >> 3] |= 1 << (index & 7)
+
+    def is_explored(self, x, y):
+        block = self.blocks.get((x >> BLOCK_SHIFT, y >> BLOCK_SHIFT))
+        if block is None:
+            return False
+        index = ((y & BLOCK_MASK) << BLOCK_SHIFT) | (x & BLOCK_MASK)
+        return block[index >> 3] >> (index & 7) & 1 == 1
+
+    def row_mask(self, y, x, width):
+        # One byte per cell of part of a row: 1 where explored
+        parts = []
+        while width > 0:
+            offset = x & BLOCK_MASK
+            run = min(width, BLOCK_SIZE - offset)
+            block = self.blocks.get((x >> BLOCK_SHIFT, y >> BLOCK_SHIFT))
+            if block is None:
+                parts.append(bytes(run))
+            else:
+                start = (y & BLOCK_MASK) * ROW_BYTES
+                bits = b''.join([EXPANDED_BITS[value] for value in block[start:start + ROW_BYTES]])
+                parts.append(bits[offset:offset + run])
+            x += run
+            width -= run
+        return b''.join(parts)
+
+    def pack(self):
+        return b''.join(BLOCK_KEY.pack(*key) + bytes(block) for key, block in sorted(self.blocks.items()))
+
+    @classmethod
+    def unpack(cls, data):
+        explored = cls()
+        record_size = BLOCK_KEY.size + BLOCK_BYTES
+        for offset in range(0, len(data) - record_size + 1, record_size):
+            key = BLOCK_KEY.unpack_from(data, offset)
+            explored.blocks[key] = bytearray(data[offset + BLOCK_KEY.size:offset + record_size])
+        return explored
+
+class FieldOfView:
+    # Symmetric shadowcasting: a cell is visible from the viewer exactly when the viewer is visible from
+    # it, so monsters can use the player's view to know whether they see the player. Slopes are kept as
+    # integer fractions. The result is a bitset over the square around the viewer plus the list of
+    # visible cells, and is only recomputed when the viewer moves or the map changes.
+    def __init__(self, radius=FOV_RADIUS):
+        self.radius = radius
+        self.size = 2 * radius + 1
+        self.bits = bytearray((self.size * self.size + 7) // 8)
+        self.cells = []
+        self.origin = (0, 0)
+        self.key = None
+        self.grid = None
+        self.version = 0  # Bumped on every recomputation, so the renderer knows when to relight
+
+    def update(self, tile_map, x, y, explored):
+        key = (tile_map, tile_map.version, x, y)
+        if key == self.key:
+            return False
+        self.key = key
+        self.compute(tile_map, x, y)
+        explored.mark_all(self.cells)
+        self.version += 1
+        return True
+
+    def is_visible(self, x, y):
+        radius, size = self.radius, self.size
+        dx, dy = x - self.origin[0] + radius, y - self.origin[1] + radius
+        if not (0 <= dx < size and 0 <= dy < size):
+            return False
+        index = dy * size + dx
+        return self.bits[index >> 3] >> (index & 7) & 1 == 1
+
+    def transparency(self, tile_map):
+        # Transparency of the loaded area with an opaque border as wide as the radius, rebuilt when the map changes
+        grid = self.grid
+        if grid is None or not grid.is_current(tile_map):
+            grid = self.grid = TransparencyGrid(tile_map, border=self.radius)
+        return grid
+
+    def compute(self, tile_map, origin_x, origin_y):
+        radius, size = self.radius, self.size
+        bits = self.bits = bytearray(len(self.bits))
+        cells = self.cells = []
+        self.origin = (origin_x, origin_y)
+        grid = self.transparency(tile_map)
+        transparent, stride, origin = grid.cells, grid.stride, grid.encode(origin_x, origin_y)
+        left, top, right, bottom = grid.origin_x, grid.origin_y, grid.origin_x + grid.width, grid.origin_y + grid.height
+        # A little over radius squared gives rounder edges
+        limit = radius * radius + radius
+
+        centre = radius * size + radius
+        bits[centre >> 3] |= 1 << (centre & 7)
+        cells.append((origin_x, origin_y))
+        for column_dx, column_dy, depth_dx, depth_dy in QUADRANTS:
+            # Offsets of one column and one row step, in the grid and in the bitset window
+            column_step, depth_step = column_dy * stride + column_dx, depth_dy * stride + depth_dx
+            column_bit, depth_bit = column_dy * size + column_dx, depth_dy * size + depth_dx
+            # Rows still to scan: depth, start slope and end slope as numerator/denominator
+            rows = [(1, -1, 1, 1, 1)]
+            while rows:
+                depth, start_num, start_den, end_num, end_den = rows.pop()
+                if depth > radius:
+                    continue
+                # Columns from round-half-up(depth * start) to round-half-down(depth * end)
+                min_column = (2 * depth * start_num + start_den) // (2 * start_den)
+                max_column = -((end_den - 2 * depth * end_num) // (2 * end_den))
+                row_index = origin + depth * depth_step
+                row_bit = centre + depth * depth_bit
+                previous_wall = None
+                for column in range(min_column, max_column + 1):
+                    wall = not transparent[row_index + column * column_step]
+                    # Floors are only lit when their centre is inside the visible wedge, which keeps it symmetric
+                    if (wall or (column * start_den >= depth * start_num and column * end_den <= depth * end_num)) \
+                            and column * column + depth * depth <= limit:
+                        index = row_bit + column * column_bit
+                        if not bits[index >> 3] >> (index & 7) & 1:
+                            bits[index >> 3] |= 1 << (index & 7)
+                            x = origin_x + column * column_dx + depth * depth_dx
+                            y = origin_y + column * column_dy + depth * depth_dy
+                            if left <= x < right and top <= y < bottom:
+                                cells.append((x, y))
+                    if previous_wall and not wall:
+                        start_num, start_den = 2 * column - 1, 2 * depth
+                    elif previous_wall is False and wall:
+                        rows.append((depth + 1, start_num, start_den, 2 * column - 1, 2 * depth))
+                    previous_wall = wall
+                if previous_wall is False:
+                    rows.append((depth + 1, start_num, start_den, end_num, end_den))
@@ -1,40 +1,85 @@
-import curses
-import heapq
 import random
-import sys
 from classes.entity import Entity
-from classes.item import Item, Equipment
-from classes.map_generator import MapGenerator
-from classes.item_loader import all_items, all_consumables, all_equipment
-from curses import KEY_NPAGE, KEY_PPAGE  # Add this import at the top of the file
+from classes.item import Equipment
+from classes.map_generator import ALGORITHMS, MapGenerator
+from classes.keys import KEY_CTRL_P, KEY_DOWN, KEY_NPAGE, KEY_PPAGE, KEY_UP
 from classes.input_handler import InputHandler
-from classes.renderer import Renderer
+from classes.chunked_map import generate_world
 from classes.combat_system import CombatSystem
-from classes.item import Equipment
+from classes.flow_field import FlowField
+from classes.fov import ExploredTiles, FieldOfView
+from classes.level_store import Level, LevelStore
+from classes.message_log import MessageLog
+from classes.monster_store import MonsterStore
+from classes.rng import RandomStreams
+from classes.pathfinding import create_pathfinder
+from classes.spatial_index import SpatialIndex
+from classes.timers import TurnTimers
 
 class Game:
-    def __init__(self, height, width, stdscr):
+    # Enemy scaling per dungeon level; exposed as class attributes so balance runs can sweep them
+    DIFFICULTY_STEP = 0.1
+    DIFFICULTY_CAP = 2
+    ACTION_TIME = 100  # Ticks between the actions of an actor at speed 100
+    REGENERATION_INTERVAL = 10  # The player heals a point every this many turns
+    SPAWN_INTERVAL = 50  # and a new enemy turns up every this many
+    SAVE_PATH = 'progue.sav'
+    MESSAGE_LOG_PAGE = 20  # Messages per page of scrollback
+
+    def __init__(self, height, width, stdscr=None, seed=None, generate=True, pregenerate=False, chunked=False,
+                 fit_screen=True, algorithm='rooms'):
         self.height = height
         self.width = width
+        # Chunked games play in a world of height x width that is generated as it is explored,
+        # instead of a level that has to fit on the screen
+        self.chunked = chunked
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown map algorithm {algorithm!r}; choose from {', '.join(ALGORITHMS)}")
+        if chunked and algorithm != 'rooms':
+            raise ValueError("Chunked worlds are always built from rooms")
+        self.algorithm = algorithm  # How MapGenerator lays out each level
+        self.fit_screen = fit_screen
         self.stdscr = stdscr
-        self.screen_height, self.screen_width = stdscr.getmaxyx()
-        self.map_generator = MapGenerator(height, width, self.screen_height, self.screen_width)
-        self.map, self.rooms = self.map_generator.generate()
+        if not fit_screen:
+            # The renderer scrolls, so levels are exactly height x width however big the terminal is
+            self.screen_height = self.screen_width = None
+        elif stdscr is not None:
+            self.screen_height, self.screen_width = stdscr.getmaxyx()
+        else:
+            # Headless games size the map as if the front end had given them the whole screen
+            self.screen_height, self.screen_width = height + 3, width
+        # All randomness comes from streams derived from one seed, so a seed plus the key stream replays a game
+        self.rng = RandomStreams(seed)
+        self.seed = self.rng.seed
+        # Filled in by generate_level, or by the save a game is restored from
+        self.map, self.rooms = None, []
         self.player = Entity(width // 2, height // 2, '@', "Player", 100, 10, 0)
+        self.player.rng = self.rng.player
         self.player.initialize_player()
-        self.enemies = []
-        self.inventory_page = 0
+        # One clock for the whole game: timed events, and the boosts of the player and every monster
+        self.timers = TurnTimers()
+        self.player.timers = self.timers
+        self.enemies = MonsterStore(self.timers)
+        self.spatial_index = SpatialIndex()
         self.items_per_page = 26  # Change this to 26 (a-z)
         self.items = []
-        self.messages = []
+        self.messages = MessageLog(lambda: self.turn_count)
         self.turn_count = 0
         self.last_spawn_turn = 0
+        self.time = 0  # In ticks; the player's next action is due now
+        self.start_timers()
         self.dungeon_level = 1
         self.stairs_x = None
         self.stairs_y = None
         self.stairs_up_x = None
         self.stairs_up_y = None
-        self.generate_level()
+        self.generated_map_version = None
+        self.fov = FieldOfView()
+        self.explored = ExploredTiles()  # Per level; swapped with the rest of the level
+        self.level_store = LevelStore(pregenerate=pregenerate)
+        # Games restored from a save fill in the level themselves
+        if generate:
+            self.generate_level()
         self.inventory_page = 0
         self.inventory_mode = False
         self.character_screen_mode = False
@@ -44,59 +89,122 @@ class Game:
         self.backpack_mode = False
         self.backpack_page = 0
         self.drop_mode = False
+        self.message_log_mode = False
+        self.message_log_top = 0  # First message shown in the scrollback
         self.input_handler = InputHandler(self)
-        self.renderer = Renderer(self)
-        self.combat_system = CombatSystem()
-        self.spawn_items()
-        self.time = 0
+        self.renderer = None
+        if stdscr is not None:
+            # Only the curses front end needs a renderer, so headless games never import curses
+            from classes.renderer import Renderer
+            self.renderer = Renderer(self)
+        self.combat_system = CombatSystem(self.rng.combat)
+        self.flow_field = FlowField()
+        self.pathfinders = {}
+        self.pathfinding_engine = 'astar'
         self.selected_slot = None
         self.debug_mode = False
+        self.quit_confirmation = False
+        self.escaped = False
+        if generate:
+            self.level_store.prefetch(self)
+            # The first frame shows what the player sees before any turn has run
+            self.update_fov()
+
+    def attach_rng(self, rng):
+        # Swaps in a new set of random streams for every subsystem that draws from them
+        self.rng = rng
+        self.player.rng = rng.player
+        self.combat_system = CombatSystem(rng.combat)
+
+    def save_game(self, path=None):
+        from classes.savegame import save_game
+        save_game(self, path or self.SAVE_PATH)
+        self.messages.append(f"Game saved to {path or self.SAVE_PATH}.")
 
     def open_character_stats_screen(self):
         self.character_stats_mode = True
 
     def spawn_item_in_inventory(self):
         item = self.create_random_item()
+        if item is None:
+            self.messages.append("There are no items to spawn.")
+            return
         self.player.add_item(item)
         self.messages.append(f"Spawned {item.name} in your inventory.")
 
-    def spawn_items(self, num_items=None):
+    def spawn_items(self, num_items=None, rng=None, level=None, area=None):
+        # Spawns onto the current level, or onto a level being built when one is given
+        target = level or self
         if num_items is None:
             # Reduce the number of items spawned by 50%
-            num_items = max(1, (5 + self.dungeon_level) // 2)
+            num_items = max(1, (5 + target.dungeon_level) // 2)
         for _ in range(num_items):
-            x, y = self.get_random_floor()
-            item = self.create_random_item()
-            item.x, item.y = x, y
-            self.items.append(item)
-
-    def create_random_item(self):
-        item_template = random.choice(all_items)
-        if isinstance(item_template, Equipment):
-            return Equipment(item_template.name, item_template.char, item_template.slot, item_template.stat_boost)
-        else:
-            return Item(item_template.name, item_template.char, item_template.effect)
+            x, y = self.get_random_floor(rng, level, area)
+            item = self.create_random_item(rng, target.dungeon_level)
+            if item is None:
+                continue
+            item.set_position(x, y)
+            target.add_floor_item(item)
+
+    def add_enemy(self, enemy):
+        # Copies the entity into the monster store; the stored monster is what ends up on the level
+        monster = self.enemies.add(enemy)
+        self.spatial_index.add(monster)
+        return monster
+
+    def remove_enemy(self, enemy):
+        self.enemies.remove(enemy)
+        self.spatial_index.remove(enemy)
+
+    def add_floor_item(self, item):
+        self.items.append(item)
+        self.spatial_index.add(item)
+
+    def remove_floor_item(self, item):
+        # Items compare equal by name, so remove this exact instance
+        for i, floor_item in enumerate(self.items):
+            if floor_item is item:
+                del self.items[i]
+                break
+        self.spatial_index.remove(item)
+
+    def create_random_item(self, rng=None, dungeon_level=None):
+        # Drawn from the loot table of the given depth, by default the current one
+        from classes.item_loader import catalog
+        return catalog.random_item(rng or self.rng.loot, dungeon_level or self.dungeon_level)
 
     def combat(self, attacker, defender):
         defeated = self.combat_system.combat(attacker, defender, self.messages)
         if defeated:
             if defender in self.enemies:
-                self.enemies.remove(defender)
-                dropped_item = self.combat_system.player_attack_enemy(attacker, defender, self.messages)
+                self.remove_enemy(defender)
+                dropped_item = self.combat_system.player_attack_enemy(attacker, defender, self.messages,
+                                                                      self.dungeon_level)
                 if dropped_item:
-                    self.items.append(dropped_item)
+                    self.add_floor_item(dropped_item)
                     self.messages.append(f"{defender.name} dropped a {dropped_item.name}!")
             elif defender == self.player:
                 self.messages.append("Game Over!")
         return defeated
 
     def handle_input(self, key):
-        if self.inventory_mode:
-            self.input_handler.handle_inventory_input(key)
+        if self.quit_confirmation:
+            return self.input_handler.handle_quit_confirmation(key)
+        if self.debug_mode and key == 27:  # ESC key
+            self.debug_mode = False
+        elif self.inventory_mode:
+            if key in (ord('+'), ord('.'), KEY_NPAGE):  # Next page (+ key, . key, or PgDn)
+                self.next_inventory_page()
+            elif key in (ord('-'), ord(','), KEY_PPAGE):  # Previous page (- key, , key, or PgUp)
+                self.prev_inventory_page()
+            else:
+                self.input_handler.handle_inventory_input(key)
         elif self.backpack_mode:
             self.handle_backpack_input(key)
         elif self.drop_mode:
             self.handle_drop_input(key)
+        elif self.message_log_mode:
+            self.handle_message_log_input(key)
         elif self.character_screen_mode:
             self.input_handler.handle_character_screen_input(key)
         elif self.character_stats_mode:
@@ -112,17 +220,26 @@ class Game:
             self.backpack_page = 0
         elif key == ord('@'):
             self.open_character_stats_screen()
+        elif key in (ord('M'), KEY_CTRL_P):
+            self.open_message_log()
         elif key == ord('Q'):
             return self.input_handler.handle_quit()
+        elif key == ord('S'):
+            self.save_game()
         elif key == ord('!'):  # Ensure this line is present
             self.input_handler.handle_debug_input(key)
         else:
             self.input_handler.handle_input(key)
-        return False  # Don't exit the game
+        return self.escaped  # Exit once the player has left the dungeon
+
+    def next_inventory_page(self):
+        self.inventory_page = min(self.inventory_page + 1, self.player.inventory.page_count(self.items_per_page) - 1)
+
+    def prev_inventory_page(self):
+        self.inventory_page = max(0, self.inventory_page - 1)
 
     def handle_backpack_input(self, key):
-        inventory_items = self.player.get_inventory_items()
-        max_pages = (len(inventory_items) - 1) // self.items_per_page
+        max_pages = self.player.inventory.page_count(self.items_per_page) - 1
 
         if key == 27:  # ESC key
             self.backpack_mode = False
@@ -134,8 +251,7 @@ class Game:
             self.use_backpack_item(chr(key))
 
     def handle_drop_input(self, key):
-        inventory_items = self.player.get_inventory_items()
-        max_pages = (len(inventory_items) - 1) // self.items_per_page
+        max_pages = self.player.inventory.page_count(self.items_per_page) - 1
 
         if key == 27:  # ESC key
             self.drop_mode = False
@@ -146,18 +262,31 @@ class Game:
         elif 97 <= key <= 122:  # a-z
             self.drop_backpack_item(chr(key))
 
-    def handle_drop_input(self, key):
-        inventory_items = self.player.get_inventory_items()
-        max_pages = (len(inventory_items) - 1) // self.items_per_page
-
+    def message_log_page(self):
+        # Messages the scrollback shows at once: a full page, or as many as fit under its header
+        if self.stdscr is None:
+            return self.MESSAGE_LOG_PAGE
+        height, _ = self.stdscr.getmaxyx()
+        return min(self.MESSAGE_LOG_PAGE, max(1, height - 3))
+
+    def open_message_log(self):
+        # The scrollback opens on its last page
+        self.message_log_mode = True
+        self.message_log_top = max(0, len(self.messages) - self.message_log_page())
+
+    def handle_message_log_input(self, key):
+        page = self.message_log_page()
+        last_top = max(0, len(self.messages) - page)
         if key == 27:  # ESC key
-            self.drop_mode = False
-        elif key in [ord('+'), ord('='), KEY_NPAGE]:
-            self.backpack_page = min(self.backpack_page + 1, max_pages)
+            self.message_log_mode = False
+        elif key in [ord('k'), KEY_UP]:
+            self.message_log_top = max(0, self.message_log_top - 1)
+        elif key in [ord('j'), KEY_DOWN]:
+            self.message_log_top = min(last_top, self.message_log_top + 1)
         elif key in [ord('-'), KEY_PPAGE]:
-            self.backpack_page = max(0, self.backpack_page - 1)
-        elif 97 <= key <= 122:  # a-z
-            self.drop_backpack_item(chr(key))
+            self.message_log_top = max(0, self.message_log_top - page)
+        elif key in [ord('+'), ord('='), KEY_NPAGE]:
+            self.message_log_top = min(last_top, self.message_log_top + page)
 
     def draw(self, stdscr):
         self.renderer.draw(stdscr)
@@ -174,95 +303,174 @@ class Game:
     def draw_drop_interface(self, stdscr):
         self.renderer.draw_drop_interface(stdscr)
 
-    def generate_level(self):
-        self.map, self.rooms, self.stairs_up_x, self.stairs_up_y, self.stairs_x, self.stairs_y = self.map_generator.generate_level(self.player)        
-        self.spawn_enemies(len(self.rooms))
-        self.spawn_items()
+    def level_rng(self, dungeon_level):
+        return random.Random(f"{self.seed}:level:{dungeon_level}")
+
+    def generate_map(self, rng):
+        if self.chunked:
+            return generate_world(self.width, self.height, rng)
+        return MapGenerator(self.height, self.width, self.screen_height, self.screen_width, self.algorithm,
+                            rng).generate_level()
+
+    def build_level(self, dungeon_level):
+        # Each depth is generated from its own seed and only touches the new Level, so levels can be
+        # built ahead of time on the level store's worker thread or rebuilt after being packed
+        rng = self.level_rng(dungeon_level)
+        tile_map, rooms, *stairs = self.generate_map(rng)
+        level = Level(dungeon_level, tile_map, rooms, stairs, self.timers)
+        if self.chunked:
+            # Only the chunks around the arrival point exist so far; the rest are populated as they are reached
+            tile_map.load_around(*stairs[:2])
+            for chunk in tile_map.take_new_chunks():
+                self.populate_chunk(chunk, level)
+            return level
+        self.spawn_enemies(len(rooms), rng, level)
+        self.spawn_items(rng=rng, level=level)
+        return level
 
-    def spawn_enemies(self, num_enemies):
+    def generate_level(self):
+        self.build_level(self.dungeon_level).apply(self)
+        self.player.x, self.player.y = self.stairs_up_x, self.stairs_up_y
+
+    def populate_chunk(self, chunk, level=None):
+        # A chunk gets its enemies and an item from its own seed the first time it is generated
+        target = level or self
+        rng = random.Random(f"{self.seed}:level:{target.dungeon_level}:chunk:{chunk.chunk_x}:{chunk.chunk_y}")
+        size = target.map.chunk_size
+        area = (chunk.chunk_x * size, chunk.chunk_y * size, size, size)
+        self.spawn_enemies(len(chunk.rooms), rng, level, area)
+        self.spawn_items(1, rng, level, area)
+
+    def load_chunks(self):
+        # Keeps the world loaded around the player; a no-op for whole-level maps
+        self.map.load_around(self.player.x, self.player.y)
+        for chunk in self.map.take_new_chunks():
+            self.populate_chunk(chunk)
+
+    def spawn_enemies(self, num_enemies, rng=None, level=None, area=None):
+        from classes.item_loader import catalog
+        rng = rng or self.rng.spawn
+        target = level or self
+        health_potion = catalog.item("Health Potion")  # Some monsters carry one
         for _ in range(num_enemies):
-            x, y = self.get_random_floor()
-            difficulty_factor = min(2, 1 + (self.dungeon_level - 1) * 0.1)
-            health = int((random.randint(20, 40) + self.dungeon_level * 5) * difficulty_factor)
-            damage = int((random.randint(5, 10) + self.dungeon_level) * difficulty_factor)
-            defense = int((random.randint(0, 3) + self.dungeon_level // 2) * difficulty_factor)
-            enemy = Entity(x, y, 'E', f"Enemy Lv{self.dungeon_level}", health, damage, defense)
-            if random.random() < 0.3:
-                enemy.add_item(Item("Health Potion", '!', lambda e: setattr(e, 'health', min(e.max_health, e.health + 20))))
-            self.enemies.append(enemy)
-
-    def get_random_floor(self):
+            x, y = self.get_random_floor(rng, level, area)
+            health, damage, defense = self.roll_enemy_stats(target.dungeon_level, rng)
+            enemy = target.enemies.create(x, y, 'E', f"Enemy Lv{target.dungeon_level}", health, damage, defense)
+            if rng.random() < 0.3 and health_potion:
+                enemy.add_item(health_potion)
+            target.spatial_index.add(enemy)
+
+    @classmethod
+    def roll_enemy_stats(cls, dungeon_level, rng=random):
+        difficulty_factor = min(cls.DIFFICULTY_CAP, 1 + (dungeon_level - 1) * cls.DIFFICULTY_STEP)
+        health = int((rng.randint(20, 40) + dungeon_level * 5) * difficulty_factor)
+        damage = int((rng.randint(5, 10) + dungeon_level) * difficulty_factor)
+        defense = int((rng.randint(0, 3) + dungeon_level // 2) * difficulty_factor)
+        return health, damage, defense
+
+    def get_random_floor(self, rng=None, level=None, area=None):
+        # Searches `area` (x, y, width, height), by default the loaded part of the map
+        rng = rng or self.rng.spawn
+        target = level or self
+        tile_map = target.map
+        left, top, width, height = area or tile_map.active_bounds()
         while True:
-            x = random.randint(0, self.map_generator.width - 1)
-            y = random.randint(0, self.map_generator.height - 1)
-            if self.map[y][x] == '.' and not any(e.x == x and e.y == y for e in self.enemies):
+            x = rng.randint(left, left + width - 1)
+            y = rng.randint(top, top + height - 1)
+            if tile_map.get(x, y) == '.' and target.spatial_index.entity_at(x, y) is None:
                 return x, y
 
     def is_valid_move(self, x, y):
-        return 0 <= x < self.width and 0 <= y < self.height and self.map[y][x] in ['.', '>', '<']
+        return self.map.is_passable(x, y)
 
     def process_turn(self):
         # Remove any defeated enemies
-        self.enemies = [enemy for enemy in self.enemies if enemy.health > 0]
-        
+        for enemy in self.enemies.take_defeated():
+            self.remove_enemy(enemy)
+
+        self.load_chunks()
+        self.update_fov()
         self.move_enemies()
         self.turn_count += 1
-        
-        if self.turn_count % 10 == 0:
-            heal_amount = min(self.player.max_health - self.player.health, 1)
-            self.player.health += heal_amount
-            if heal_amount > 0:
-                self.messages.append(f"You feel a bit better. (+{heal_amount} HP)")
-
-        if self.turn_count - self.last_spawn_turn >= 50:
-            self.spawn_enemies(1)
-            self.last_spawn_turn = self.turn_count
+        # Regeneration, respawns and boost expiry fire here when due
+        self.timers.advance(self.turn_count)
         
         # Check for items on the floor (only if not already in messages)
-        for item in self.items:
-            if item.x == self.player.x and item.y == self.player.y:
-                message = f"Floor: {item.name}"
-                if message not in self.messages:
-                    self.messages.append(message)
-
-        self.player.update_temporary_boosts()
+        for item in self.spatial_index.items_at(self.player.x, self.player.y):
+            message = f"Floor: {item.name}"
+            if message not in self.messages:
+                self.messages.append(message)
+
+    def start_timers(self):
+        # Reschedules the recurring events from the turn counters, for new and loaded games alike
+        self.timers.clear(self.turn_count)
+        self.timers.schedule(self.REGENERATION_INTERVAL - self.turn_count % self.REGENERATION_INTERVAL, self.regenerate)
+        self.timers.schedule(max(1, self.last_spawn_turn + self.SPAWN_INTERVAL - self.turn_count), self.respawn)
+
+    def regenerate(self):
+        heal_amount = min(self.player.max_health - self.player.health, 1)
+        self.player.health += heal_amount
+        if heal_amount > 0:
+            self.messages.append(f"You feel a bit better. (+{heal_amount} HP)")
+        self.timers.schedule(self.REGENERATION_INTERVAL, self.regenerate)
+
+    def respawn(self):
+        self.spawn_enemies(1)
+        self.last_spawn_turn = self.turn_count
+        self.timers.schedule(self.SPAWN_INTERVAL, self.respawn)
 
     def check_collisions(self):
-        for item in self.items[:]:
-            if item.x == self.player.x and item.y == self.player.y:
-                self.player.add_item(item)
-                self.items.remove(item)
-                self.messages.append(f"You picked up {item.name}.")
+        for item in list(self.spatial_index.items_at(self.player.x, self.player.y)):
+            self.player.add_item(item)
+            self.remove_floor_item(item)
+            self.messages.append(f"You picked up {item.name}.")
+
+    def update_fov(self):
+        # Part of the turn: wakes the monsters that came into view. The renderer only reads fov.cells,
+        # so drawing never changes the game. Only recomputed when the player moved or the map changed
+        self.fov.update(self.map, self.player.x, self.player.y, self.explored)
+        # The field of view is symmetric: a monster sees the player exactly when the player sees it
+        for x, y in self.fov.cells:
+            for entity in self.spatial_index.entities_at(x, y):
+                if entity is not self.player and not entity.awake:
+                    entity.awake = True
+                    self.enemies.schedule(entity, self.time)
+
+    def action_delay(self, entity):
+        # Faster actors act more often: speed 200 acts twice for every action at speed 100
+        return max(1, self.ACTION_TIME * 100 // entity.speed)
 
     def move_enemies(self):
-        for enemy in self.enemies:
-            if self.distance(enemy, self.player) <= 1:
+        # Awake monsters act in order of their next action time until the player's next action
+        # comes up; each one is then rescheduled according to its own speed
+        player_x, player_y = self.player.x, self.player.y
+        # One shared distance-to-player field per turn instead of an A* search per enemy
+        self.flow_field.update(self.map, player_x, player_y)
+        now, until = self.time, self.time + self.action_delay(self.player)
+        enemies, action_time = self.enemies, self.ACTION_TIME * 100
+        for time, enemy in enemies.due(until):
+            slot = enemy.slot
+            x, y = enemies.x[slot], enemies.y[slot]
+            if abs(x - player_x) <= 1 and abs(y - player_y) <= 1:
                 self.combat(enemy, self.player)
             else:
-                path = self.find_path(enemy, self.player)
-                if path and len(path) > 1:
-                    next_pos = path[1]  # The next position in the path
-                    if not any(e.x == next_pos[0] and e.y == next_pos[1] for e in self.enemies):
-                        enemy.x, enemy.y = next_pos
+                next_pos = self.flow_field.next_step(x, y)
+                if next_pos and self.spatial_index.entity_at(*next_pos) is None:
+                    enemy.set_position(*next_pos)
+            # Monsters left behind on another level pick up from now rather than catching up
+            enemies.schedule(enemy, max(time, now) + max(1, action_time // enemies.speed[enemy.slot]))
+        self.time = until
 
-    def next_level(self):
-        self.dungeon_level += 1
-        self.messages.append(f"You descend to dungeon level {self.dungeon_level}.")
-        self.enemies.clear()
-        self.items.clear()
-        self.generate_level()
-    
     def open_inventory(self):
         self.inventory_mode = True
         self.inventory_page = 0
     
     def pickup_item(self):
-        for item in self.items:
-            if item.x == self.player.x and item.y == self.player.y:
-                self.player.add_item(item)
-                self.items.remove(item)
-                self.messages.append(f"You picked up a {item.name}.")
-                return
+        for item in self.spatial_index.items_at(self.player.x, self.player.y):
+            self.player.add_item(item)
+            self.remove_floor_item(item)
+            self.messages.append(f"You picked up a {item.name}.")
+            return
         self.messages.append("There's nothing here to pick up.")
 
     def use_item(self, item):
@@ -278,10 +486,9 @@ class Game:
         self.messages.append(result)
     
     def use_backpack_item(self, item_key):
-        inventory_items = self.player.get_inventory_items()
-        index = ord(item_key) - ord('a') + self.backpack_page * self.items_per_page
-        if 0 <= index < len(inventory_items):
-            item, _ = inventory_items[index]
+        entry = self.player.inventory.at(ord(item_key) - ord('a') + self.backpack_page * self.items_per_page)
+        if entry:
+            item, _ = entry
             if isinstance(item, Equipment):
                 self.equip_item(item)
             else:
@@ -290,26 +497,14 @@ class Game:
             self.messages.append("Invalid item.")
 
     def drop_backpack_item(self, item_key):
-        inventory_items = self.player.get_inventory_items()
-        index = ord(item_key) - ord('a') + self.backpack_page * self.items_per_page
-        if 0 <= index < len(inventory_items):
-            item, _ = inventory_items[index]
-            self.player.remove_item(item)
-            item.x, item.y = self.player.x, self.player.y
-            self.items.append(item)
-            self.messages.append(f"You dropped {item.name}.")
-            self.drop_mode = False
-        else:
-            self.messages.append("Invalid item.")
-
-    def drop_backpack_item(self, item_key):
-        inventory_items = self.player.get_inventory_items()
-        index = ord(item_key) - ord('a') + self.backpack_page * self.items_per_page
-        if 0 <= index < len(inventory_items):
-            item, _ = inventory_items[index]
-            self.player.remove_item(item)
-            item.x, item.y = self.player.x, self.player.y
-            self.items.append(item)
+        entry = self.player.inventory.at(ord(item_key) - ord('a') + self.backpack_page * self.items_per_page)
+        if entry:
+            item, _ = entry
+            self.player.inventory.remove(item, 1)
+            # The stack keeps its representative, which may be a shared catalog instance, so the floor gets a copy
+            dropped = item.prototype.create()
+            dropped.set_position(self.player.x, self.player.y)
+            self.add_floor_item(dropped)
             self.messages.append(f"You dropped {item.name}.")
             self.drop_mode = False
         else:
@@ -321,10 +516,9 @@ class Game:
         return ord('A')
     
     def use_or_equip_item(self, key):
-        inventory_items = self.player.get_inventory_items()
-        index = ord(key) - ord('a')
-        if 0 <= index < len(inventory_items):
-            item, _ = inventory_items[index]
+        entry = self.player.inventory.at(ord(key) - ord('a'))
+        if entry:
+            item, _ = entry
             if isinstance(item, Equipment):
                 self.equip_item(item)
             else:
@@ -354,7 +548,7 @@ class Game:
         self.messages.append(f"Congratulations! You've escaped the dungeon with treasure worth {total_value} gold!")
         self.messages.append("Press any key to exit.")
         self.wait_for_key()
-        sys.exit()
+        self.escaped = True
 
     def use_stairs(self, direction):
         if direction == 'down' and self.player.x == self.stairs_x and self.player.y == self.stairs_y:
@@ -372,70 +566,33 @@ class Game:
         # For now, we'll just pass
         pass
     
+    def change_level(self, dungeon_level):
+        # The level being left goes into the store; the next one comes from it when it was visited before
+        self.level_store.stash(self)
+        self.dungeon_level = dungeon_level
+        if not self.level_store.restore(self):
+            self.generate_level()
+        self.level_store.prefetch(self)
+
     def next_level(self):
-        self.dungeon_level += 1
+        self.change_level(self.dungeon_level + 1)
         self.messages.append(f"You descend to dungeon level {self.dungeon_level}.")
-        self.enemies.clear()
-        self.items.clear()
-        self.generate_level()
+        # Place the player on the up stairs of the next level
+        self.player.x, self.player.y = self.stairs_up_x, self.stairs_up_y
+        self.load_chunks()
 
     def previous_level(self):
-        self.dungeon_level -= 1
+        self.change_level(self.dungeon_level - 1)
         self.messages.append(f"You ascend to dungeon level {self.dungeon_level}.")
-        self.enemies.clear()
-        self.items.clear()
-        self.generate_level()
         # Place the player on the down stairs of the previous level
         self.player.x, self.player.y = self.stairs_x, self.stairs_y
+        self.load_chunks()
     
-    def heuristic(self, a, b):
-        return abs(b.x - a[0]) + abs(b.y - a[1])
-        
-    def find_path(self, start, goal):
-        start_pos = (start.x, start.y)
-        goal_pos = (goal.x, goal.y)
-
-        neighbors = [(0,1), (0,-1), (1,0), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)]
-        close_set = set()
-        came_from = {}
-        gscore = {start_pos: 0}
-        fscore = {start_pos: self.heuristic(start_pos, goal)}
-        open_heap = []
-        heapq.heappush(open_heap, (fscore[start_pos], start_pos))
-
-        while open_heap:
-            current = heapq.heappop(open_heap)[1]
-            if current == goal_pos:
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.append(start_pos)
-                path.reverse()
-                return path
-
-            close_set.add(current)
-
-            for i, j in neighbors:
-                neighbor = current[0] + i, current[1] + j
-                if 0 <= neighbor[0] < self.width and 0 <= neighbor[1] < self.height:
-                    if self.map[neighbor[1]][neighbor[0]] in ['#', ' ']:
-                        continue
-                    if neighbor in close_set:
-                        continue
-
-                    tentative_g_score = gscore[current] + 1
-
-                    if neighbor not in [i[1] for i in open_heap]:
-                        heapq.heappush(open_heap, (fscore.get(neighbor, float('inf')), neighbor))
-                    elif tentative_g_score >= gscore.get(neighbor, float('inf')):
-                        continue
-
-                    came_from[neighbor] = current
-                    gscore[neighbor] = tentative_g_score
-                    fscore[neighbor] = gscore[neighbor] + self.heuristic(neighbor, goal)
-
-        return None
+    def find_path(self, start, goal, engine=None):
+        engine = engine or self.pathfinding_engine
+        if engine not in self.pathfinders:
+            self.pathfinders[engine] = create_pathfinder(engine)
+        return self.pathfinders[engine].find_path(self.map, (start.x, start.y), (goal.x, goal.y))
 
     def distance(self, entity1, entity2):
         return max(abs(entity1.x - entity2.x), abs(entity1.y - entity2.y))
@@ -445,12 +602,10 @@ class Game:
         self.equipment_slot = None
     
     def equip_item(self, item_key):
-        inventory_items = self.player.get_inventory_items()
-        
         if isinstance(item_key, str):
-            index = ord(item_key) - ord('a')
-            if 0 <= index < len(inventory_items):
-                item, _ = inventory_items[index]
+            entry = self.player.inventory.at(ord(item_key) - ord('a'))
+            if entry:
+                item, _ = entry
             else:
                 self.messages.append("Invalid item.")
                 return
@@ -480,19 +635,19 @@ class Game:
 
     def player_move_or_attack(self, dx, dy):
         new_x, new_y = self.player.x + dx, self.player.y + dy
-        enemy_at_position = next((e for e in self.enemies if e.x == new_x and e.y == new_y), None)
+        enemy_at_position = self.spatial_index.entity_at(new_x, new_y)
 
         if enemy_at_position:
             self.combat(self.player, enemy_at_position)
         elif self.is_valid_move(new_x, new_y):
-            self.player.x, self.player.y = new_x, new_y
+            self.player.set_position(new_x, new_y)
             self.process_turn()
 
     def handle_equipment_input(self, key):
         if key in range(ord('a'), ord('m') + 1):
             slot_key = chr(key)
             slot = self.player.equipment[slot_key]
-            equippable_items = [item for item in self.player.inventory if isinstance(item, Equipment) and item.slot == slot['name']]
+            equippable_items = self.player.inventory.equippable(slot['name'])
             
             if equippable_items:
                 item_to_equip = equippable_items[0]  # Choose the first equippable item
@@ -0,0 +1,133 @@
+import argparse
+import sys
+import time
+
+from classes.game import Game
+from classes.item import Equipment
+from classes.map_generator import ALGORITHMS
+from classes.pathfinding import NEIGHBORS, create_pathfinder
+
+class HeadlessEngine:
+    # Drives the game rules from a stream of commands, without curses or a terminal
+    def __init__(self, height=21, width=80, **game_options):
+        self.game = Game(height, width, **game_options)
+        self.commands_run = 0
+
+    @property
+    def finished(self):
+        return self.game.escaped or self.game.player.health <= 0
+
+    def execute(self, command, *args):
+        game = self.game
+        self.commands_run += 1
+        if command == 'move':
+            game.player_move_or_attack(int(args[0]), int(args[1]))
+        elif command == 'wait':
+            game.process_turn()
+        elif command == 'pickup':
+            game.pickup_item()
+            game.process_turn()
+        elif command == 'stairs':
+            game.use_stairs(args[0])
+            game.process_turn()
+        elif command == 'use':
+            game.use_backpack_item(args[0])
+        elif command == 'drop':
+            game.drop_backpack_item(args[0])
+        elif command == 'equip':
+            game.equip_item(args[0])
+        elif command == 'unequip':
+            game.unequip_item(args[0])
+        elif command == 'key':
+            # Raw key codes go through the same dispatch as the curses front end
+            return game.handle_input(int(args[0]))
+        else:
+            raise ValueError(f"Unknown command: {command}")
+        return False
+
+    def run(self, commands, max_commands=None):
+        for command in commands:
+            if self.finished or (max_commands is not None and self.commands_run >= max_commands):
+                break
+            if isinstance(command, str):
+                command = parse_command(command)
+                if command is None:
+                    continue
+            if self.execute(*command):
+                break
+        return self.commands_run
+
+def parse_command(line):
+    # "move 1 -1", "stairs down", "use a", "key 104"; blank lines and # comments are skipped
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return None
+    return tuple(line.split())
+
+class DiveBot:
+    # Simple policy for automated runs: drink when hurt, fight what is adjacent, otherwise head for the stairs down
+    def __init__(self, game, heal_below=0.4, engine='jps'):
+        self.game = game
+        self.heal_below = heal_below
+        self.pathfinder = create_pathfinder(engine)
+        self.path = []
+
+    def commands(self):
+        while True:
+            yield self.next_command()
+
+    def next_command(self):
+        game, player = self.game, self.game.player
+        if player.health < player.max_health * self.heal_below:
+            for index, (item, _) in enumerate(player.inventory.page(0, game.items_per_page)):
+                if not isinstance(item, Equipment) and item.name.endswith('Health Potion'):
+                    game.backpack_page = 0
+                    return ('use', chr(ord('a') + index))
+        for dx, dy in NEIGHBORS:
+            if game.spatial_index.entity_at(player.x + dx, player.y + dy):
+                return ('move', dx, dy)
+        stairs = (game.stairs_x, game.stairs_y)
+        if (player.x, player.y) == stairs:
+            return ('stairs', 'down')
+        # In chunked worlds the stairs may not be loaded yet, so the bot heads for the next chunk towards them
+        goal = game.map.waypoint(player.x, player.y, *stairs)
+        # The cached path is reused until the player leaves it or the goal changes
+        if not self.path or self.path[0] != (player.x, player.y) or self.path[-1] != goal:
+            self.path = self.pathfinder.find_path(game.map, (player.x, player.y), goal) or []
+        if len(self.path) > 1:
+            x, y = self.path[1]
+            self.path = self.path[1:]
+            return ('move', x - player.x, y - player.y)
+        return ('wait',)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the game without a terminal.")
+    parser.add_argument('--height', type=int, default=21)
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunked', action='store_true', help="play in a height x width world generated in chunks")
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='rooms', help="how levels are laid out")
+    parser.add_argument('--turns', type=int, default=10000, help="commands to run with the built-in bot")
+    parser.add_argument('--commands', help="file of commands to run instead of the bot ('-' for stdin)")
+    args = parser.parse_args(argv)
+
+    if args.chunked and args.algorithm != 'rooms':
+        parser.error("chunked worlds are always built from rooms, so --algorithm cannot be combined with --chunked")
+    engine = HeadlessEngine(args.height, args.width, seed=args.seed, chunked=args.chunked, algorithm=args.algorithm)
+    if args.commands:
+        stream = sys.stdin if args.commands == '-' else open(args.commands)
+        commands = iter(stream)
+    else:
+        commands = DiveBot(engine.game).commands()
+
+    start = time.perf_counter()
+    engine.run(commands, max_commands=args.turns)
+    elapsed = time.perf_counter() - start
+
+    game = engine.game
+    print(f"Commands: {engine.commands_run}  Turns: {game.turn_count}  Dungeon level: {game.dungeon_level}  "
+          f"Health: {game.player.health}/{game.player.max_health}  Player level: {game.player.level}")
+    print(f"Elapsed: {elapsed:.3f}s  ({engine.commands_run / elapsed if elapsed else 0:.0f} commands/s)")
+
+if __name__ == '__main__':
+    main()
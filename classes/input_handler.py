@@ -1,6 +1,4 @@
-import curses
-
-from classes.item import Equipment
+from classes.keys import KEY_DOWN, KEY_LEFT, KEY_NPAGE, KEY_PPAGE, KEY_RIGHT, KEY_UP
 
 class InputHandler:
     def __init__(self, game):
@@ -35,10 +33,10 @@ class InputHandler:
 
     def handle_main_game_input(self, key):
         movement_keys = {
-            ord('8'): (0, -1), ord('k'): (0, -1), curses.KEY_UP: (0, -1),
-            ord('2'): (0, 1), ord('j'): (0, 1), curses.KEY_DOWN: (0, 1),
-            ord('4'): (-1, 0), ord('h'): (-1, 0), curses.KEY_LEFT: (-1, 0),
-            ord('6'): (1, 0), ord('l'): (1, 0), curses.KEY_RIGHT: (1, 0),
+            ord('8'): (0, -1), ord('k'): (0, -1), KEY_UP: (0, -1),
+            ord('2'): (0, 1), ord('j'): (0, 1), KEY_DOWN: (0, 1),
+            ord('4'): (-1, 0), ord('h'): (-1, 0), KEY_LEFT: (-1, 0),
+            ord('6'): (1, 0), ord('l'): (1, 0), KEY_RIGHT: (1, 0),
             ord('7'): (-1, -1), ord('y'): (-1, -1),
             ord('9'): (1, -1), ord('u'): (1, -1),
             ord('1'): (-1, 1), ord('b'): (-1, 1),
@@ -66,15 +64,18 @@ class InputHandler:
         self.game.process_turn()
 
     def handle_quit(self):
+        # The answer arrives as the next key, so no front end has to block here
         self.game.messages.append("Are you sure you want to quit? Your character will be lost! (Y/N)")
-        self.game.renderer.draw(self.game.stdscr)  # Use the renderer to draw
-        while True:
-            key = self.game.stdscr.getch()
-            if key in [ord('Y'), ord('y')]:
-                return True  # Signal to quit the game
-            elif key in [ord('N'), ord('n'), 27]:  # 'N', 'n', or ESC
-                self.game.messages.pop()  # Remove the confirmation message
-                return False  # Don't quit, continue the game
+        self.game.quit_confirmation = True
+        return False
+
+    def handle_quit_confirmation(self, key):
+        if key in [ord('Y'), ord('y')]:
+            return True  # Signal to quit the game
+        elif key in [ord('N'), ord('n'), 27]:  # 'N', 'n', or ESC
+            self.game.quit_confirmation = False
+            self.game.messages.pop()  # Remove the confirmation message
+        return False  # Don't quit, continue the game
 
     def handle_inventory_input(self, key):
         if key == 27:  # ESC key
@@ -87,9 +88,9 @@ class InputHandler:
         if self.game.selected_slot is None:
             if key in range(ord('a'), ord('m') + 1):
                 self.game.selected_slot = chr(key)
-            elif key in [ord('+'), ord('='), curses.KEY_NPAGE]:
+            elif key in [ord('+'), ord('='), KEY_NPAGE]:
                 self.game.next_inventory_page()
-            elif key in [ord('-'), curses.KEY_PPAGE]:
+            elif key in [ord('-'), KEY_PPAGE]:
                 self.game.prev_inventory_page()
             elif key == ord('E'):
                 self.game.messages.append("Select an item to equip (a-z):")
@@ -98,7 +99,7 @@ class InputHandler:
             elif 97 <= key <= 109:  # a-m
                 self.game.unequip_item(chr(key))
         else:
-            equippable_items = [item for item in self.game.player.inventory if isinstance(item, Equipment) and item.slot == self.game.player.equipment[self.game.selected_slot]['name']]
+            equippable_items = self.game.player.inventory.equippable(self.game.player.equipment[self.game.selected_slot]['name'])
             if key == ord('-') and not equippable_items:
                 self.game.unequip_item(self.game.selected_slot)
             else:
@@ -148,6 +149,4 @@ class InputHandler:
             self.game.debug_mode = False
             return
 
-        item = self.game.create_random_item()
-        self.game.player.add_item(item)
-        self.game.messages.append(f"Spawned {item.name} in your inventory.")
+        self.game.spawn_item_in_inventory()
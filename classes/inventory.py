@@ -0,0 +1,71 @@
+class Inventory:
+    # Stacks of carried items keyed by catalog name, in the order they were first picked up.
+    # Adding, removing and counting go through the name index alone. The names are also kept in a
+    # list in display order, so the screens look up a position or a page without walking the rest.
+    # Equipment is also indexed by slot.
+    def __init__(self):
+        self.stacks = {}  # name -> (item, count), in display order
+        self.order = []  # Stack names in display order
+        self.slots = {}  # equipment slot -> {name: item}
+
+    def __len__(self):
+        return len(self.stacks)
+
+    def __iter__(self):
+        return (item for item, _ in self.stacks.values())
+
+    def __contains__(self, item):
+        return item.name in self.stacks
+
+    def items(self):
+        return list(self.stacks.values())
+
+    def count(self, item):
+        stack = self.stacks.get(item.name)
+        return 0 if stack is None else stack[1]
+
+    def add(self, item, count=1):
+        stack = self.stacks.get(item.name)
+        if stack is not None:
+            self.stacks[item.name] = (stack[0], stack[1] + count)
+            return
+        self.stacks[item.name] = (item, count)
+        self.order.append(item.name)
+        slot = getattr(item, 'slot', None)
+        if slot is not None:
+            self.slots.setdefault(slot, {})[item.name] = item
+
+    def remove(self, item, count=1):
+        stack = self.stacks.get(item.name)
+        if stack is None:
+            return False
+        stack, total = stack
+        if total > count:
+            self.stacks[item.name] = (stack, total - count)
+            return True
+        del self.stacks[item.name]
+        # Only the names after it move up, in one block move
+        self.order.remove(item.name)
+        slot = getattr(stack, 'slot', None)
+        if slot is not None:
+            del self.slots[slot][stack.name]
+        return True
+
+    def clear(self):
+        self.stacks.clear()
+        self.order.clear()
+        self.slots.clear()
+
+    def at(self, index):
+        # The (item, count) at a position, or None
+        return self.stacks[self.order[index]] if 0 <= index < len(self.order) else None
+
+    def page(self, number, size):
+        stacks = self.stacks
+        return [stacks[name] for name in self.order[number * size:(number + 1) * size]]
+
+    def page_count(self, size):
+        return max(1, (len(self.stacks) - 1) // size + 1)
+
+    def equippable(self, slot):
+        return list(self.slots.get(slot, {}).values())
@@ -1,13 +1,63 @@
+from collections import namedtuple
+
+class ItemPrototype(namedtuple('ItemPrototype', 'index name char effect duration slot stat_boost depth weight')):
+    # Everything items of one kind share, loaded once from the catalog; index is the catalog position,
+    # depth the shallowest dungeon level it drops on and weight how often it drops there
+    __slots__ = ()
+
+    def create(self):
+        return (Item if self.slot is None else Equipment)(self)
+
 class Item:
-    def __init__(self, name, char, effect, duration=None):
-        self.name = name
-        self.char = char
-        self.effect = effect
-        self.duration = duration
-        self.x = None
-        self.y = None
+    spatial_layer = 'items'
+    # Instances only hold what differs between copies; the rest comes from the prototype
+    __slots__ = ('prototype', 'spatial_index', '_x', '_y', 'quantity')
+
+    def __init__(self, prototype):
+        self.prototype = prototype
+        self.spatial_index = None
+        self._x = None
+        self._y = None
         self.quantity = 1
 
+    @property
+    def name(self):
+        return self.prototype.name
+
+    @property
+    def char(self):
+        return self.prototype.char
+
+    @property
+    def effect(self):
+        return self.prototype.effect
+
+    @property
+    def duration(self):
+        return self.prototype.duration
+
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self.set_position(value, self._y)
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self.set_position(self._x, value)
+
+    def set_position(self, x, y):
+        old_position = (self._x, self._y)
+        self._x, self._y = x, y
+        if self.spatial_index is not None:
+            self.spatial_index.move(self, old_position)
+
     def __eq__(self, other):
         if isinstance(other, Item):
             return self.name == other.name
@@ -17,7 +67,12 @@ class Item:
         return hash(self.name)
 
 class Equipment(Item):
-    def __init__(self, name, char, slot, stat_boost):
-        super().__init__(name, char, None)
-        self.slot = slot
-        self.stat_boost = stat_boost
\ No newline at end of file
+    __slots__ = ()
+
+    @property
+    def slot(self):
+        return self.prototype.slot
+
+    @property
+    def stat_boost(self):
+        return self.prototype.stat_boost
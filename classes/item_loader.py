@@ -1,28 +1,82 @@
-import json
+import marshal
 import os
-from classes.item import Item, Equipment
+from bisect import bisect_right
 
-def load_items():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    json_path = os.path.join(script_dir, '..', 'data', 'items.json')
-    
-    with open(json_path, 'r') as file:
-        data = json.load(file)
+from classes.item import ItemPrototype
+from classes.loot_table import LootTable
 
-    consumables = []
-    equipment = []
+ITEMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'items.json')
+CATALOG_FORMAT = 2  # Bump when the compiled form changes, so cached catalogs are rebuilt
+# Loot for entries without their own "weight" and "depth": an item's tier is its rank by power among
+# the items for the same slot (or with the same effect), and each tier is rarer and found deeper
+LOOT_WEIGHT = 12  # Tier n drops with weight LOOT_WEIGHT // n, but at least 1
+DEPTH_PER_TIER = 2  # Dungeon levels between one tier and the next starting to drop
 
-    for item_data in data['consumables']:
-        effect = create_effect(item_data['effect'], item_data['value'])
-        item = Item(item_data['name'], item_data['char'], effect, item_data.get('duration', None))
-        consumables.append(item)
+def compile_items(data):
+    # items.json as plain tuples and lists, so the result can be cached with marshal: a record per
+    # item in catalog order, and the loot tables (see ItemCatalog) as indices with their alias columns
+    entries = [(item, 'effect', item['effect'], item['value']) for item in data['consumables']]
+    entries += [(item, 'slot', item['slot'], item['stat_boost']) for item in data['equipment']]
+    powers = {}
+    for _, kind, group, power in entries:
+        powers.setdefault((kind, group), set()).add(power)
+    tiers = {key: {power: tier for tier, power in enumerate(sorted(values), 1)} for key, values in powers.items()}
+    records = []
+    for item, kind, group, power in entries:
+        tier = tiers[kind, group][power]
+        depth = item.get('depth', 1 + (tier - 1) * DEPTH_PER_TIER)
+        weight = item.get('weight', max(1, LOOT_WEIGHT // tier))
+        if weight < 0:
+            raise ValueError(f"{item['name']} has a negative loot weight")
+        if kind == 'effect':
+            records.append((item['name'], item['char'], group, power, item.get('duration'), None, None, depth, weight))
+        else:
+            records.append((item['name'], item['char'], None, None, None, group, power, depth, weight))
 
-    for item_data in data['equipment']:
-        item = Equipment(item_data['name'], item_data['char'], item_data['slot'], item_data['stat_boost'])
-        equipment.append(item)
+    bands = {}
+    for index, record in enumerate(records):
+        if record[8] > 0:
+            bands.setdefault(record[7], []).append(index)
+    depths = sorted(bands)
+    band_tables = [LootTable.build(bands[depth], [records[index][8] for index in bands[depth]]) for depth in depths]
+    totals = [sum(records[index][8] for index in bands[depth]) for depth in depths]
+    level_tables = [LootTable.build(list(range(count)), totals[:count]) for count in range(1, len(depths) + 1)]
+    loot = (depths, [(table.entries, table.keep, table.alias) for table in band_tables],
+            [(table.keep, table.alias) for table in level_tables])
+    return records, loot
 
-    all_items = consumables + equipment
-    return consumables, equipment, all_items
+def cache_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, '__pycache__', f"{name}.catalog")
+
+def load_compiled(path=ITEMS_PATH):
+    # The compiled catalog is cached beside the source, keyed by its modification time and size and
+    # by the loot defaults compiling it applied
+    source = os.stat(path)
+    key = (CATALOG_FORMAT, LOOT_WEIGHT, DEPTH_PER_TIER, source.st_mtime_ns, source.st_size)
+    cache = cache_path(path)
+    try:
+        with open(cache, 'rb') as file:
+            # Read whole, since unmarshalling straight from the file is many times slower
+            cached_key, compiled = marshal.loads(file.read())
+        if cached_key == key:
+            return compiled
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    import json
+    with open(path, 'r') as file:
+        compiled = compile_items(json.load(file))
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        # Written aside and moved into place, so a concurrent start never reads half a cache
+        partial = f"{cache}.{os.getpid()}"
+        with open(partial, 'wb') as file:
+            file.write(marshal.dumps((key, compiled)))
+        os.replace(partial, cache)
+    except OSError:
+        pass  # Read-only installs compile the catalog on every start instead
+    return compiled
 
 def create_effect(effect_type, value):
     if effect_type == 'heal':
@@ -36,4 +90,84 @@ def create_effect(effect_type, value):
     else:
         return lambda e: None  # Null effect if not recognized
 
-all_consumables, all_equipment, all_items = load_items()
\ No newline at end of file
+class ItemCatalog:
+    # The compiled items.json: prototypes by ID (their position in the catalog), name, slot and char,
+    # and the loot tables that weight random items by how deep they are found. Items are grouped in
+    # bands by the depth they start to drop at; a level's table picks one of the bands it has reached
+    # by their total weight and the band's own table picks the item, so every draw stays O(1) and the
+    # tables only take space for each item once plus a row per band and level threshold.
+    def __init__(self, compiled):
+        records, (depths, bands, levels) = compiled
+        self.prototypes = [
+            ItemPrototype(index, name, char, None if effect is None else create_effect(effect, value), duration,
+                          slot, stat_boost, depth, weight)
+            for index, (name, char, effect, value, duration, slot, stat_boost, depth, weight) in enumerate(records)]
+        # One shared instance per prototype stands for carried items, which have no position of their own
+        self.instances = {}  # index -> instance, made when first needed
+        self.by_name = {prototype.name: prototype for prototype in self.prototypes}
+        self.by_slot = {}
+        self.by_char = {}
+        for prototype in self.prototypes:
+            if prototype.slot is not None:
+                self.by_slot.setdefault(prototype.slot, []).append(prototype)
+            self.by_char.setdefault(prototype.char, []).append(prototype)
+        self.loot_depths = depths
+        bands = [LootTable([self.prototypes[index] for index in indices], keep, alias)
+                 for indices, keep, alias in bands]
+        self.loot_tables = [LootTable(bands[:len(keep)], keep, alias) for keep, alias in levels]
+
+    def __len__(self):
+        return len(self.prototypes)
+
+    def __getitem__(self, index):
+        return self.prototypes[index]
+
+    def shared(self, index):
+        item = self.instances.get(index)
+        if item is None:
+            item = self.instances[index] = self.prototypes[index].create()
+        return item
+
+    def item(self, name):
+        # The shared instance of a catalog item, or None
+        prototype = self.by_name.get(name)
+        return None if prototype is None else self.shared(prototype.index)
+
+    @property
+    def items(self):
+        return [self.shared(index) for index in range(len(self.prototypes))]
+
+    @property
+    def consumables(self):
+        return [self.shared(prototype.index) for prototype in self.prototypes if prototype.slot is None]
+
+    @property
+    def equipment(self):
+        return [self.shared(prototype.index) for prototype in self.prototypes if prototype.slot is not None]
+
+    def loot_table(self, dungeon_level):
+        # Levels use the table of the deepest threshold they have reached; the first one covers anything
+        # shallower. None when nothing in the catalog drops at all (every weight set to 0).
+        if not self.loot_tables:
+            return None
+        return self.loot_tables[max(0, bisect_right(self.loot_depths, dungeon_level) - 1)]
+
+    def random_item(self, rng, dungeon_level=1):
+        # A new item from the level's loot table, or None if there is nothing to draw
+        table = self.loot_table(dungeon_level)
+        return None if table is None else table.sample(rng).create()
+
+def load_catalog(path=ITEMS_PATH):
+    return ItemCatalog(load_compiled(path))
+
+# Older names for the catalog's lists
+ALIASES = {'item_prototypes': 'prototypes', 'all_items': 'items', 'all_consumables': 'consumables',
+           'all_equipment': 'equipment'}
+
+def __getattr__(name):
+    # The catalog is loaded the first time it is imported from here, not when this module is
+    if name != 'catalog' and name not in ALIASES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    catalog = load_catalog()
+    globals().update({alias: getattr(catalog, attribute) for alias, attribute in ALIASES.items()}, catalog=catalog)
+    return globals()[name]
@@ -0,0 +1,9 @@
+# Key codes shared with curses, so game logic can interpret input without importing curses
+KEY_DOWN = 258
+KEY_UP = 259
+KEY_LEFT = 260
+KEY_RIGHT = 261
+KEY_NPAGE = 338
+KEY_PPAGE = 339
+KEY_ESCAPE = 27
+KEY_CTRL_P = 16
@@ -0,0 +1,192 @@
+import struct
+import zlib
+from collections import OrderedDict
+
+from classes.chunked_map import ChunkedMap
+from classes.fov import ExploredTiles
+from classes.monster_store import MonsterStore
+from classes.spatial_index import SpatialIndex
+
+LIVE_LEVELS = 4  # Most recently visited levels kept as objects
+# Packed levels start with one byte for the kind of map, then the compressed record
+WHOLE_MAP, CHUNKED_MAP = b'\x00', b'\x01'
+PACKED_HEADER = struct.Struct('<IIII')  # changed tiles (chunked maps: packed world size), strings, enemies, floor items
+TILE_CHANGE = struct.Struct('<IB')  # tile index, tile id
+
+class Level:
+    # One dungeon level: its map and everything on it, with its own spatial index, so the game can
+    # swap whole levels in and out when the player takes the stairs
+    def __init__(self, dungeon_level, tile_map, rooms, stairs, timers=None):
+        self.dungeon_level = dungeon_level
+        self.map = tile_map
+        self.rooms = rooms
+        self.stairs = tuple(stairs)  # up x, up y, down x, down y
+        self.generated_map_version = tile_map.version
+        self.explored = ExploredTiles()
+        self.enemies = MonsterStore(timers)
+        self.items = []
+        self.spatial_index = SpatialIndex()
+
+    @classmethod
+    def from_game(cls, game):
+        level = cls(game.dungeon_level, game.map, game.rooms,
+                    (game.stairs_up_x, game.stairs_up_y, game.stairs_x, game.stairs_y))
+        level.generated_map_version = game.generated_map_version
+        level.explored = game.explored
+        level.enemies, level.items, level.spatial_index = game.enemies, game.items, game.spatial_index
+        return level
+
+    def add_enemy(self, enemy):
+        self.spatial_index.add(self.enemies.add(enemy))
+
+    def add_floor_item(self, item):
+        self.items.append(item)
+        self.spatial_index.add(item)
+
+    def apply(self, game):
+        game.map = self.map
+        game.rooms = self.rooms
+        game.stairs_up_x, game.stairs_up_y, game.stairs_x, game.stairs_y = self.stairs
+        game.generated_map_version = self.generated_map_version
+        game.explored = self.explored
+        game.enemies, game.items, game.spatial_index = self.enemies, self.items, self.spatial_index
+
+class LevelStore:
+    # Visited levels stay live in an LRU; older ones are packed as the level seed plus what changed
+    # since generation: edited tiles, the enemies and floor items as compact records, and what was explored
+    def __init__(self, capacity=LIVE_LEVELS, pregenerate=False):
+        self.capacity = capacity
+        self.live = OrderedDict()
+        self.packed = {}
+        # Levels being built ahead of time on a worker thread, by dungeon level
+        self.pending = {}
+        self.pregenerate = pregenerate
+        self.executor = None  # Started by the first prefetch
+
+    def __contains__(self, dungeon_level):
+        return dungeon_level in self.live or dungeon_level in self.packed
+
+    def stash(self, game):
+        self.live[game.dungeon_level] = Level.from_game(game)
+        self.live.move_to_end(game.dungeon_level)
+        self.packed.pop(game.dungeon_level, None)
+        while len(self.live) > self.capacity:
+            dungeon_level, level = self.live.popitem(last=False)
+            self.packed[dungeon_level] = pack_level(game, dungeon_level, level)
+
+    def restore(self, game):
+        # Brings in game.dungeon_level if it was visited or built ahead of time; returns False when
+        # it still has to be generated
+        dungeon_level = game.dungeon_level
+        level = self.live.pop(dungeon_level, None)
+        if level is None:
+            level = self.take_pending(dungeon_level)
+            data = self.packed.pop(dungeon_level, None)
+            if data is not None:
+                level = unpack_level(game, dungeon_level, data, level)
+        if level is None:
+            return False
+        level.apply(game)
+        return True
+
+    def prefetch(self, game):
+        # Queues the levels above and below for building while the player is busy on this one;
+        # packed levels get their fresh base built too, so only the stored changes are left to apply
+        if not self.pregenerate:
+            return
+        if self.executor is None:
+            # Imported here so games that never build ahead do not pay for the thread pool
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pregenerate')
+        for dungeon_level in list(self.pending):
+            if abs(dungeon_level - game.dungeon_level) > 1:
+                self.pending.pop(dungeon_level).cancel()
+        for dungeon_level in (game.dungeon_level + 1, game.dungeon_level - 1):
+            if dungeon_level >= 1 and dungeon_level not in self.live and dungeon_level not in self.pending:
+                self.pending[dungeon_level] = self.executor.submit(game.build_level, dungeon_level)
+
+    def take_pending(self, dungeon_level):
+        future = self.pending.pop(dungeon_level, None)
+        if future is None or future.cancel():
+            # Still queued behind other work, so building it right away is quicker
+            return None
+        # Already being built: waiting for it beats starting again
+        return future.result()
+
+    def packed_levels(self, game):
+        # Every stored level in packed form, for save files
+        levels = dict(self.packed)
+        for dungeon_level, level in self.live.items():
+            levels[dungeon_level] = pack_level(game, dungeon_level, level)
+        return levels
+
+def pristine_tiles(game, dungeon_level):
+    return game.generate_map(game.level_rng(dungeon_level))[0].tiles
+
+def tile_changes(game, dungeon_level, level):
+    # Gameplay rarely edits tiles, so the level is only regenerated to diff against when it did
+    if isinstance(level.map, ChunkedMap):
+        return []
+    if level.map.version == level.generated_map_version:
+        return []
+    tiles = level.map.tiles
+    return [(index, tile_id) for index, (original, tile_id) in enumerate(zip(pristine_tiles(game, dungeon_level), tiles))
+            if original != tile_id]
+
+def pack_level(game, dungeon_level, level):
+    from classes.savegame import ITEM_RECORD, StringTable, catalog_id, pack_entity
+    if isinstance(level.map, ChunkedMap):
+        # Chunked worlds keep their own edits per chunk
+        kind, map_data = CHUNKED_MAP, level.map.pack()
+        map_size = len(map_data)
+    else:
+        changes = tile_changes(game, dungeon_level, level)
+        kind, map_data = WHOLE_MAP, b''.join(TILE_CHANGE.pack(index, tile_id) for index, tile_id in changes)
+        map_size = len(changes)
+    strings = StringTable()
+    entities = b''.join(pack_entity(enemy, strings) for enemy in level.enemies)
+    data = b''.join([
+        PACKED_HEADER.pack(map_size, len(strings.indices), len(level.enemies), len(level.items)),
+        map_data,
+        strings.pack(),
+        entities,
+        b''.join(ITEM_RECORD.pack(catalog_id(item), item.x, item.y, item.quantity) for item in level.items),
+        level.explored.pack(),
+    ])
+    return kind + zlib.compress(data)
+
+def unpack_level(game, dungeon_level, data, level=None):
+    from classes.entity import Entity
+    from classes.savegame import ITEM_RECORD, new_item, unpack_entity, unpack_strings
+    kind, data = data[:1], zlib.decompress(data[1:])
+    map_size, string_count, enemy_count, item_count = PACKED_HEADER.unpack_from(data, 0)
+    offset = PACKED_HEADER.size
+    # Building from the level seed recreates the map, rooms and stairs exactly
+    level = level or game.build_level(dungeon_level)
+    if kind == CHUNKED_MAP:
+        level.map = ChunkedMap.unpack(data[offset:offset + map_size])
+        offset += map_size
+    else:
+        tiles = level.map.tiles
+        for index, tile_id in TILE_CHANGE.iter_unpack(data[offset:offset + map_size * TILE_CHANGE.size]):
+            tiles[index] = tile_id
+        if map_size:
+            level.map.version += 1
+        offset += map_size * TILE_CHANGE.size
+    strings, offset = unpack_strings(data, offset, string_count)
+    # The freshly spawned population is replaced by the stored one
+    level.enemies, level.items, level.spatial_index = MonsterStore(game.timers), [], SpatialIndex()
+    for _ in range(enemy_count):
+        enemy = Entity(0, 0, '', '', 0, 0, 0)
+        enemy.timers = game.timers
+        offset = unpack_entity(data, offset, enemy, strings)
+        level.add_enemy(enemy)
+    for index, x, y, quantity in ITEM_RECORD.iter_unpack(data[offset:offset + item_count * ITEM_RECORD.size]):
+        item = new_item(index)
+        item.set_position(x, y)
+        item.quantity = quantity
+        level.add_floor_item(item)
+    offset += item_count * ITEM_RECORD.size
+    # Explored cells fill the rest; levels packed before there was a field of view have none
+    level.explored = ExploredTiles.unpack(data[offset:])
+    return level
@@ -0,0 +1,38 @@
+class LootTable:
+    # Weighted choice in O(1) per draw with Walker's alias method. Each of the n columns keeps its own
+    # entry with probability keep[i] and hands the rest of its share to alias[i], so a single uniform
+    # draw picks both the column and the side. Entries can be tables themselves, which are drawn from in turn.
+    __slots__ = ('entries', 'keep', 'alias')
+
+    def __init__(self, entries, keep, alias):
+        self.entries = entries
+        self.keep = keep
+        self.alias = alias
+
+    @classmethod
+    def build(cls, entries, weights):
+        count = len(weights)
+        total = sum(weights)
+        if not count or total <= 0:
+            raise ValueError("a loot table needs at least one entry with a positive weight")
+        scaled = [weight * count / total for weight in weights]
+        keep = [1.0] * count
+        alias = list(range(count))
+        small = [index for index, share in enumerate(scaled) if share < 1]
+        large = [index for index, share in enumerate(scaled) if share >= 1]
+        while small and large:
+            under, over = small.pop(), large.pop()
+            keep[under], alias[under] = scaled[under], over
+            scaled[over] -= 1 - scaled[under]
+            (small if scaled[over] < 1 else large).append(over)
+        # Whatever is left is full up to rounding error and keeps its own entry
+        return cls(entries, keep, alias)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def sample(self, rng):
+        column = rng.random() * len(self.keep)
+        index = int(column)
+        entry = self.entries[index if column - index < self.keep[index] else self.alias[index]]
+        return entry.sample(rng) if isinstance(entry, LootTable) else entry
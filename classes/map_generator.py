@@ -1,57 +1,229 @@
 import random
+import re
+
+from classes.tile_map import TileMap, TILE_IDS
+
+BSP_MIN_LEAF_WIDTH = 10
+BSP_MIN_LEAF_HEIGHT = 7
+CAVE_SMOOTHING_STEPS = 4
+CAVE_ATTEMPTS = 5
+ROOM_BUCKET_SIZE = 8
+FLOOR_RUN = re.compile(re.escape(bytes([TILE_IDS['.']])) + b'+')
+ALGORITHMS = ('rooms', 'bsp', 'caves')  # The layouts MapGenerator can build, by name
 
 class MapGenerator:
-    def __init__(self, height, width, screen_height, screen_width):
-        self.height = min(max(10, height), screen_height - 5)  # Ensure minimum height of 10 and max height of screen height minus 5
-        self.width = min(max(20, width), screen_width - 5)  # Ensure minimum width of 20 and max width of screen width minus 5
+    def __init__(self, height, width, screen_height, screen_width, algorithm='rooms', rng=random):
+        self.height = max(10, height)  # Ensure minimum height of 10
+        self.width = max(20, width)  # Ensure minimum width of 20
+        if screen_height is not None:
+            # Levels that must fit on the screen stay 5 rows and columns smaller than it
+            self.height = min(self.height, screen_height - 5)
+            self.width = min(self.width, screen_width - 5)
+        self.algorithm = algorithm
+        self.rng = rng
+        self.algorithms = {
+            'rooms': self._generate_map_and_rooms,
+            'bsp': self._generate_bsp,
+            'caves': self._generate_caves,
+        }
 
     def generate(self):
-        # Existing map generation logic
-        self.map, self.rooms = self._generate_map_and_rooms()
-        
+        self.map, self.rooms = self.algorithms[self.algorithm]()
+
         # Ensure the bottom row is always a wall
-        for x in range(self.width):
-            self.map[self.height - 1][x] = '#'
-        
+        self.map.fill_row(self.height - 1, 0, self.width - 1, '#')
+
         return self.map, self.rooms
 
     def _generate_map_and_rooms(self):
-        self.map = [['#' for _ in range(self.width)] for _ in range(self.height)]
+        self.map = TileMap(self.width, self.height)
         rooms = []
-        max_rooms = min(10, (self.height * self.width) // 100)  # Adjust max rooms based on map size
-        
+        # Rooms are bucketed on a coarse grid; overlapping rooms always share a bucket
+        room_buckets = {}
+        # Adjust max rooms based on map size; larger maps get proportionally more rooms
+        max_rooms = min(max(10, (self.height * self.width) // 400), (self.height * self.width) // 100)
+
         for _ in range(max_rooms):
-            room_height = max(3, min(5, random.randint(3, self.height // 3)))
-            room_width = max(5, min(7, random.randint(5, self.width // 3)))
-            
+            room_height = max(3, min(5, self.rng.randint(3, self.height // 3)))
+            room_width = max(5, min(7, self.rng.randint(5, self.width // 3)))
+
             # Ensure there's space for the room
             if self.height - room_height - 1 <= 1 or self.width - room_width - 1 <= 1:
                 continue
-            
-            x = random.randint(1, self.width - room_width - 1)
-            y = random.randint(1, self.height - room_height - 1)
-            
+
+            x = self.rng.randint(1, self.width - room_width - 1)
+            y = self.rng.randint(1, self.height - room_height - 1)
+
             # Check if the room overlaps with any existing room
-            if not any(self.rooms_overlap(x, y, room_width, room_height, r) for r in rooms):
+            buckets = self.room_buckets(x, y, room_width, room_height)
+            nearby_rooms = [r for bucket in buckets for r in room_buckets.get(bucket, ())]
+            if not any(self.rooms_overlap(x, y, room_width, room_height, r) for r in nearby_rooms):
                 self.create_room(x, y, room_width, room_height)
                 rooms.append((x, y, room_width, room_height))
-        
+                for bucket in buckets:
+                    room_buckets.setdefault(bucket, []).append(rooms[-1])
+
         # Connect rooms
         for i in range(len(rooms) - 1):
             self.create_corridor(rooms[i], rooms[i+1])
 
         return self.map, rooms
 
+    def _generate_bsp(self):
+        self.map = TileMap(self.width, self.height)
+        rooms = []
+        self._split_bsp(1, 1, self.width - 2, self.height - 2, rooms)
+        return self.map, rooms
+
+    def _split_bsp(self, x, y, w, h, rooms):
+        # Returns one room of the subtree so the caller can connect it to its sibling
+        split_vertical = w >= 2 * BSP_MIN_LEAF_WIDTH
+        split_horizontal = h >= 2 * BSP_MIN_LEAF_HEIGHT
+        if split_vertical and split_horizontal:
+            split_vertical = w / BSP_MIN_LEAF_WIDTH >= h / BSP_MIN_LEAF_HEIGHT
+        if split_vertical:
+            split = self.rng.randint(BSP_MIN_LEAF_WIDTH, w - BSP_MIN_LEAF_WIDTH)
+            first = self._split_bsp(x, y, split, h, rooms)
+            second = self._split_bsp(x + split, y, w - split, h, rooms)
+        elif split_horizontal:
+            split = self.rng.randint(BSP_MIN_LEAF_HEIGHT, h - BSP_MIN_LEAF_HEIGHT)
+            first = self._split_bsp(x, y, w, split, rooms)
+            second = self._split_bsp(x, y + split, w, h - split, rooms)
+        else:
+            # Leaf: a room with at least one wall cell between it and the leaf edge
+            room_width = self.rng.randint(min(5, w - 2), min(7, w - 2))
+            room_height = self.rng.randint(min(3, h - 2), min(5, h - 2))
+            room_x = self.rng.randint(x + 1, x + w - room_width - 1)
+            room_y = self.rng.randint(y + 1, y + h - room_height - 1)
+            self.create_room(room_x, room_y, room_width, room_height)
+            room = (room_x, room_y, room_width, room_height)
+            rooms.append(room)
+            return room
+        self.create_corridor(first, second)
+        return first
+
+    def _generate_caves(self):
+        for _ in range(CAVE_ATTEMPTS):
+            self.map = TileMap(self.width, self.height)
+            walls = self._smooth_cave(self._cave_noise())
+            self._write_cave(walls)
+            cave_runs = self._keep_largest_cave()
+            floor_count = sum(end - start for _, start, end in cave_runs)
+            if floor_count >= 2 and floor_count * 4 >= self.width * self.height:
+                return self.map, self._cave_rooms(cave_runs, floor_count)
+        # Very small or unlucky maps fall back to rooms and corridors
+        return self._generate_map_and_rooms()
+
+    def _cave_noise(self):
+        # Each row is an integer bitmask (bit x set = wall); a & (b | c | d) gives 7/16 walls
+        return [
+            self.rng.getrandbits(self.width) & (self.rng.getrandbits(self.width) | self.rng.getrandbits(self.width) | self.rng.getrandbits(self.width))
+            for _ in range(self.height)
+        ]
+
+    def _smooth_cave(self, rows):
+        # Cellular automaton "wall if at least 5 walls in the 3x3 block", computed for a whole row
+        # at a time with bit-sliced adders over the row bitmasks
+        mask = (1 << self.width) - 1
+        border = 1 | (1 << (self.width - 1))
+        rows = [mask] + [row | border for row in rows[1:-1]] + [mask]
+        for _ in range(CAVE_SMOOTHING_STEPS):
+            sums = []
+            for row in rows:
+                left, right = (row << 1) & mask, row >> 1
+                partial = left ^ row
+                sums.append((partial ^ right, (left & row) | (right & partial)))
+            smoothed = [mask]
+            for y in range(1, self.height - 1):
+                (s0, c0), (s1, c1), (s2, c2) = sums[y - 1], sums[y], sums[y + 1]
+                partial = s0 ^ s1
+                ones = partial ^ s2
+                carry = (s0 & s1) | (s2 & partial)
+                partial = c0 ^ c1
+                twos_partial = partial ^ c2
+                fours_a = (c0 & c1) | (c2 & partial)
+                twos = twos_partial ^ carry
+                fours_b = twos_partial & carry
+                fours = fours_a ^ fours_b
+                eights = fours_a & fours_b
+                smoothed.append(eights | (fours & (twos | ones)) | border)
+            smoothed.append(mask)
+            rows = smoothed
+        return rows
+
+    def _write_cave(self, rows):
+        wall, floor = TILE_IDS['#'], TILE_IDS['.']
+        # Expand each byte of a row bitmask to eight tiles with a 256-entry lookup table
+        expand = [bytes(wall if value >> bit & 1 else floor for bit in range(8)) for value in range(256)]
+        byte_count = (self.width + 7) // 8
+        for y, row in enumerate(rows):
+            tiles = b''.join(expand[value] for value in row.to_bytes(byte_count, 'little'))
+            self.map.tiles[y * self.width:(y + 1) * self.width] = tiles[:self.width]
+        self.map.version += 1
+
+    def _keep_largest_cave(self):
+        # Union-find over horizontal floor runs; runs in adjacent rows touching diagonally or
+        # directly are 8-connected, like movement
+        runs = []
+        rows = []
+        for y in range(self.height):
+            line = self.map.tiles[y * self.width:(y + 1) * self.width]
+            first = len(runs)
+            runs.extend((y, match.start(), match.end()) for match in FLOOR_RUN.finditer(line))
+            rows.append(range(first, len(runs)))
+        if not runs:
+            return []
+        parent = list(range(len(runs)))
+
+        def find(run):
+            while parent[run] != run:
+                parent[run] = parent[parent[run]]
+                run = parent[run]
+            return run
+
+        for above, below in zip(rows, rows[1:]):
+            i, j = above.start, below.start
+            while i < above.stop and j < below.stop:
+                _, start_a, end_a = runs[i]
+                _, start_b, end_b = runs[j]
+                if start_a <= end_b and start_b <= end_a:
+                    parent[find(i)] = find(j)
+                if end_a < end_b:
+                    i += 1
+                else:
+                    j += 1
+
+        sizes = {}
+        for run, (_, start, end) in enumerate(runs):
+            root = find(run)
+            sizes[root] = sizes.get(root, 0) + end - start
+        largest = max(sizes, key=sizes.get)
+        kept = []
+        for run, (y, start, end) in enumerate(runs):
+            if find(run) == largest:
+                kept.append((y, start, end))
+            else:
+                self.map.fill_row(y, start, end - 1, '#')
+        return kept
+
+    def _cave_rooms(self, cave_runs, floor_count):
+        # Caves have no rooms, so single floor cells stand in for them (stairs use the first and
+        # last, and enemy counts scale with their number)
+        count = max(2, min(max(10, floor_count // 400), floor_count // 100))
+        cells = set()
+        while len(cells) < min(count, floor_count):
+            y, start, end = self.rng.choice(cave_runs)
+            cells.add((self.rng.randrange(start, end), y))
+        return [(x, y, 1, 1) for x, y in sorted(cells)]
+
     def create_room(self, x, y, w, h):
-        for i in range(y, y + h):
-            for j in range(x, x + w):
-                self.map[i][j] = '.'
+        self.map.fill_rect(x, y, w, h, '.')
 
     def create_corridor(self, room1, room2):
         x1, y1 = room1[0] + room1[2] // 2, room1[1] + room1[3] // 2
         x2, y2 = room2[0] + room2[2] // 2, room2[1] + room2[3] // 2
-        
-        if random.random() < 0.5:
+
+        if self.rng.random() < 0.5:
             self.create_h_tunnel(x1, x2, y1)
             self.create_v_tunnel(y1, y2, x2)
         else:
@@ -59,37 +231,42 @@ class MapGenerator:
             self.create_h_tunnel(x1, x2, y2)
 
     def create_h_tunnel(self, x1, x2, y):
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.map[y][x] = '.'
+        self.map.fill_row(y, x1, x2, '.')
 
     def create_v_tunnel(self, y1, y2, x):
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.map[y][x] = '.'
+        self.map.fill_column(x, y1, y2, '.')
+
+    def room_buckets(self, x, y, w, h):
+        return [
+            (bucket_x, bucket_y)
+            for bucket_y in range(y // ROOM_BUCKET_SIZE, (y + h - 1) // ROOM_BUCKET_SIZE + 1)
+            for bucket_x in range(x // ROOM_BUCKET_SIZE, (x + w - 1) // ROOM_BUCKET_SIZE + 1)
+        ]
 
     def rooms_overlap(self, x, y, w, h, room):
         return (x < room[0] + room[2] and x + w > room[0] and
                 y < room[1] + room[3] and y + h > room[1])
 
-    def generate_level(self, player):
+    def generate_level(self, player=None):
         self.map, self.rooms = self.generate()
-        
+
         # Ensure the bottom row is always a wall
-        for x in range(self.width):
-            self.map[self.height - 1][x] = '#'
-        
+        self.map.fill_row(self.height - 1, 0, self.width - 1, '#')
+
         # Place stairs up (entry point)
         entry_room = self.rooms[0]
         stairs_up_x = entry_room[0] + entry_room[2] // 2
         stairs_up_y = entry_room[1] + entry_room[3] // 2
-        self.map[stairs_up_y][stairs_up_x] = '<'
-        
+        self.map.set(stairs_up_x, stairs_up_y, '<')
+
         # Place stairs down (exit to next level)
         exit_room = self.rooms[-1]
         stairs_x = exit_room[0] + exit_room[2] // 2
         stairs_y = exit_room[1] + exit_room[3] // 2
-        self.map[stairs_y][stairs_x] = '>'
-        
+        self.map.set(stairs_x, stairs_y, '>')
+
         # Place player at the up stairs
-        player.x, player.y = stairs_up_x, stairs_up_y
-        
-        return self.map, self.rooms, stairs_up_x, stairs_up_y, stairs_x, stairs_y
\ No newline at end of file
+        if player is not None:
+            player.x, player.y = stairs_up_x, stairs_up_y
+
+        return self.map, self.rooms, stairs_up_x, stairs_up_y, stairs_x, stairs_y
@@ -0,0 +1,88 @@
+MESSAGE_CAPACITY = 500
+
+class Message:
+    __slots__ = ('text', 'turn', 'count')
+
+    def __init__(self, text, turn):
+        self.text = text
+        self.turn = turn
+        self.count = 1
+
+    def __str__(self):
+        return self.text if self.count == 1 else f"{self.text} x{self.count}"
+
+class MessageLog:
+    # The latest messages in a fixed-size ring buffer, so a session of any length keeps the same
+    # memory. Each message is stamped with the turn it was last seen on, a message repeating the one
+    # before it is folded into it ("... x3"), and a count per text answers `text in log` without a scan.
+    # Indexing, slicing and iteration give the messages as display strings, oldest first.
+    def __init__(self, clock=lambda: 0, capacity=MESSAGE_CAPACITY):
+        self.clock = clock
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.start = 0  # Buffer position of the oldest message
+        self.size = 0
+        self.texts = {}  # text -> how many messages in the buffer have it
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, text):
+        return text in self.texts
+
+    def __iter__(self):
+        return (str(self.message(index)) for index in range(self.size))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [str(self.message(index)) for index in range(*key.indices(self.size))]
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("message index out of range")
+        return str(self.message(key))
+
+    def message(self, index):
+        # The Message at `index`, counted from the oldest
+        return self.buffer[(self.start + index) % self.capacity]
+
+    def append(self, text):
+        turn = self.clock()
+        if self.size:
+            last = self.message(self.size - 1)
+            if last.text == text:
+                last.count += 1
+                last.turn = turn
+                return
+        if self.size == self.capacity:
+            self.forget(self.buffer[self.start].text)
+            self.start = (self.start + 1) % self.capacity
+            self.size -= 1
+        self.buffer[(self.start + self.size) % self.capacity] = Message(text, turn)
+        self.size += 1
+        self.texts[text] = self.texts.get(text, 0) + 1
+
+    def pop(self):
+        # Takes back the newest message, or one repeat of it
+        if not self.size:
+            raise IndexError("pop from an empty message log")
+        last = self.message(self.size - 1)
+        if last.count > 1:
+            last.count -= 1
+            return last.text
+        self.buffer[(self.start + self.size - 1) % self.capacity] = None
+        self.size -= 1
+        self.forget(last.text)
+        return last.text
+
+    def forget(self, text):
+        count = self.texts[text] - 1
+        if count:
+            self.texts[text] = count
+        else:
+            del self.texts[text]
+
+    def lines(self, first, count):
+        # Scrollback: up to `count` messages from index `first`, with their turn stamps
+        return [f"[{message.turn:>6}] {message}"
+                for message in map(self.message, range(max(0, first), min(self.size, first + count)))]
@@ -0,0 +1,246 @@
+import heapq
+from array import array
+from itertools import count
+from operator import attrgetter
+
+from classes.entity import Entity
+from classes.inventory import Inventory
+
+# Per-monster values the turn loop reads and writes, kept as parallel arrays indexed by slot
+COLUMNS = ('_x', '_y', 'health', 'max_health', 'base_damage', 'base_defense', 'speed', 'level')
+ARRIVAL = attrgetter('serial')
+# Removed slots are compacted away once they outnumber the live ones (and there are at least this many)
+MIN_COMPACT = 64
+
+def column(name):
+    def get(self):
+        return getattr(self.store, name)[self.slot]
+
+    def set(self, value):
+        getattr(self.store, name)[self.slot] = value
+    return property(get, set)
+
+class Monster(Entity):
+    # Entity-compatible view of one slot of a MonsterStore. The hot numbers live in the store's
+    # arrays; anything else a monster was given lives in its own dict, and the rest falls back to
+    # the class defaults below, so ten thousand monsters do not carry ten thousand equipment tables.
+    __slots__ = ('store', 'slot', 'serial', 'spatial_index')
+
+    _x, _y = column('_x'), column('_y')
+    max_health, base_damage, base_defense = column('max_health'), column('base_damage'), column('base_defense')
+    speed, level = column('speed'), column('level')
+
+    def __init__(self, store, slot, serial=0):
+        self.store = store
+        self.slot = slot
+        self.serial = serial  # Order of arrival in the store; never changes
+        self.spatial_index = None
+
+    def set_position(self, x, y):
+        store, slot = self.store, self.slot
+        old_position = (store.x[slot], store.y[slot])
+        store.x[slot], store.y[slot] = x, y
+        if self.spatial_index is not None:
+            self.spatial_index.move(self, old_position)
+
+    @property
+    def health(self):
+        return self.store.health[self.slot]
+
+    @health.setter
+    def health(self, value):
+        self.store.health[self.slot] = value
+        if value <= 0:
+            self.store.defeated.add(self.slot)
+
+    @property
+    def awake(self):
+        return self.store.awake[self.slot] == 1
+
+    @awake.setter
+    def awake(self, value):
+        self.store.awake[self.slot] = 1 if value else 0
+
+    @property
+    def timers(self):
+        return self.store.timers
+
+    @property
+    def inventory(self):
+        inventory = self.__dict__.get('_inventory')
+        if inventory is None:
+            inventory = self.__dict__['_inventory'] = Inventory()
+        return inventory
+
+    @inventory.setter
+    def inventory(self, value):
+        self.__dict__['_inventory'] = value
+
+    @property
+    def equipment(self):
+        equipment = self.__dict__.get('_equipment')
+        if equipment is None:
+            equipment = self.__dict__['_equipment'] = {key: dict(slot) for key, slot in EMPTY_EQUIPMENT.items()}
+        return equipment
+
+    @equipment.setter
+    def equipment(self, value):
+        self.__dict__['_equipment'] = value
+        self.invalidate_stats()
+
+    def invalidate_stats(self):
+        # Gear, levels and boosts all come through here; once any of them has, the monster's stats
+        # are worked out the way an Entity's are
+        self.store.geared[self.slot] = 1
+        self.stats = None
+
+    @property
+    def damage(self):
+        # Without gear, boosts or extra strength a monster hits for its base damage
+        if self.store.geared[self.slot]:
+            return Entity.damage.fget(self)
+        return self.store.base_damage[self.slot]
+
+    @property
+    def defense(self):
+        if self.store.geared[self.slot]:
+            return Entity.defense.fget(self)
+        return self.store.base_defense[self.slot]
+
+_template = Entity(0, 0, '', '', 0, 0, 0)
+EMPTY_EQUIPMENT = _template.equipment
+NEW_SPEED, NEW_LEVEL = _template.speed, _template.level
+# Every other field defaults to what a new Entity starts with
+DEFAULTS = {name: value for name, value in vars(_template).items() if not hasattr(Monster, name)}
+for _name, _value in DEFAULTS.items():
+    setattr(Monster, _name, _value)
+del _template, _name, _value
+
+class Detached:
+    # What a removed monster keeps of its store: a row of its own, which callers can still read
+    __slots__ = COLUMNS + ('x', 'y', 'awake', 'geared', 'defeated', 'timers')
+
+    def __init__(self, store, slot):
+        for name in COLUMNS:
+            setattr(self, name, [getattr(store, name)[slot]])
+        self.x, self.y = self._x, self._y
+        self.awake = [store.awake[slot]]
+        self.geared = [store.geared[slot]]
+        self.defeated = set()
+        self.timers = store.timers
+
+class MonsterStore:
+    # The monsters of one level as parallel arrays, iterated in the order they were added
+    def __init__(self, timers=None):
+        for name in COLUMNS:
+            setattr(self, name, array('i'))
+        self.x, self.y = self._x, self._y
+        self.awake = bytearray()
+        self.geared = bytearray()  # 1 once a monster's stats no longer follow from its base values alone
+        self.monsters = []  # Monster per slot, None once removed
+        self.defeated = set()  # Slots whose health dropped to zero
+        self.live = 0
+        # Awake monsters bucketed by the tick of their next action, with a heap of the ticks that have
+        # a bucket; sleeping monsters are in neither and cost nothing
+        self.buckets = {}
+        self.times = []
+        self.serials = count()
+        self.timers = timers  # The game's, which the monsters' boosts expire on
+
+    def __len__(self):
+        return self.live
+
+    def __iter__(self):
+        return (monster for monster in self.monsters if monster is not None)
+
+    def __contains__(self, entity):
+        return isinstance(entity, Monster) and entity.store is self
+
+    def create(self, x, y, char, name, health, damage, defense):
+        values = (x, y, health, health, damage, defense, NEW_SPEED, NEW_LEVEL)
+        monster = self.append(Monster(self, len(self.monsters), next(self.serials)), values)
+        monster.char = char
+        monster.name = name
+        return monster
+
+    def append(self, monster, values):
+        for name, value in zip(COLUMNS, values):
+            getattr(self, name).append(value)
+        self.awake.append(0)
+        self.geared.append(0)
+        self.monsters.append(monster)
+        self.live += 1
+        return monster
+
+    def add(self, entity):
+        # Copies any Entity in, keeping only what differs from the defaults
+        state = vars(entity)
+        monster = self.create(entity.x, entity.y, entity.char, entity.name, entity.health, entity.base_damage,
+                              entity.base_defense)
+        monster.max_health, monster.speed, monster.level = entity.max_health, entity.speed, entity.level
+        monster.awake = entity.awake
+        for name, value in state.items():
+            if name in DEFAULTS and name not in ('char', 'name', 'stats') and value != DEFAULTS[name]:
+                setattr(monster, name, value)
+        if len(entity.inventory):
+            monster.inventory = entity.inventory
+        if any(slot['item'] for slot in entity.equipment.values()):
+            monster.equipment = entity.equipment
+        if (monster.strength, monster.dexterity) != (DEFAULTS['strength'], DEFAULTS['dexterity']):
+            monster.invalidate_stats()
+        # Boosts move over with the turns they have left; the entity's own expiries are called off
+        for stat, boost in getattr(entity, 'temporary_boosts', {}).items():
+            monster.apply_temporary_boost(stat, boost['value'], entity.boost_turns_left(stat))
+            entity.timers.cancel(boost['timer'])
+        return monster
+
+    def remove(self, monster):
+        slot = monster.slot
+        # Callers still read the removed monster afterwards, so it takes its row along
+        monster.store, monster.slot = Detached(self, slot), 0
+        self.monsters[slot] = None
+        self.awake[slot] = 0
+        self.defeated.discard(slot)
+        self.live -= 1
+        if len(self.monsters) - self.live > max(self.live, MIN_COMPACT):
+            self.compact()
+
+    def schedule(self, monster, time):
+        bucket = self.buckets.get(time)
+        if bucket is None:
+            bucket = self.buckets[time] = []
+            heapq.heappush(self.times, time)
+        bucket.append(monster)
+
+    def due(self, until):
+        # Pops the awake monsters whose next action comes before `until`, earliest first; monsters
+        # scheduled again while this runs are included when they are due before `until` too.
+        # Monsters due on the same tick act in the order they arrived, like a walk over the store would.
+        times, buckets = self.times, self.buckets
+        while times and times[0] < until:
+            time = heapq.heappop(times)
+            bucket = buckets.pop(time)
+            bucket.sort(key=ARRIVAL)
+            for monster in bucket:
+                if monster.store is self and self.awake[monster.slot]:
+                    yield time, monster
+
+    def take_defeated(self):
+        # Monsters whose health dropped to zero since the last call, in store order
+        defeated = [self.monsters[slot] for slot in sorted(self.defeated)]
+        self.defeated.clear()
+        return defeated
+
+    def compact(self):
+        # Drops removed slots; the order of the remaining monsters does not change
+        keep = [slot for slot, monster in enumerate(self.monsters) if monster is not None]
+        for name in COLUMNS:
+            values = getattr(self, name)
+            setattr(self, name, array('i', [values[slot] for slot in keep]))
+        self.x, self.y = self._x, self._y
+        self.awake = bytearray(self.awake[slot] for slot in keep)
+        self.geared = bytearray(self.geared[slot] for slot in keep)
+        self.defeated = {new for new, slot in enumerate(keep) if slot in self.defeated}
+        self.monsters = [self.monsters[slot] for slot in keep]
+        for slot, monster in enumerate(self.monsters):
+            monster.slot = slot
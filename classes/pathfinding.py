@@ -0,0 +1,217 @@
+import heapq
+from abc import ABC, abstractmethod
+
+NEIGHBORS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+class PassabilityGrid:
+    # Cells are stored with a blocked border, so neighbor offsets never need bounds checks.
+    # The grid covers the map's loaded area, which for chunked worlds is a window around the player
+    def __init__(self, tile_map, border=1):
+        self.map = tile_map
+        self.version = tile_map.version
+        self.origin_x, self.origin_y, self.width, self.height = tile_map.active_bounds()
+        self.border = border
+        self.stride = self.width + 2 * border
+        self.cells = bytearray(self.stride * (self.height + 2 * border))
+        mask = self.region(tile_map)
+        for y in range(self.height):
+            start = (y + border) * self.stride + border
+            self.cells[start:start + self.width] = mask[y * self.width:(y + 1) * self.width]
+        self.offsets = [dy * self.stride + dx for dx, dy in NEIGHBORS]
+
+    def region(self, tile_map):
+        return tile_map.passable_region(self.origin_x, self.origin_y, self.width, self.height)
+
+    def is_current(self, tile_map):
+        return self.map is tile_map and self.version == tile_map.version
+
+    def encode(self, x, y):
+        return (y - self.origin_y + self.border) * self.stride + x - self.origin_x + self.border
+
+    def decode(self, index):
+        y, x = divmod(index, self.stride)
+        return x - self.border + self.origin_x, y - self.border + self.origin_y
+
+    def in_bounds(self, x, y):
+        return 0 <= x - self.origin_x < self.width and 0 <= y - self.origin_y < self.height
+
+    def is_passable(self, x, y):
+        return self.in_bounds(x, y) and self.cells[self.encode(x, y)] == 1
+
+class TransparencyGrid(PassabilityGrid):
+    # Same layout, holding which cells let light through
+    def region(self, tile_map):
+        return tile_map.transparent_region(self.origin_x, self.origin_y, self.width, self.height)
+
+class Pathfinder(ABC):
+    # Grid caching and path reconstruction; subclasses supply the search itself
+    def __init__(self):
+        self.grid = None
+
+    def grid_for(self, game_map):
+        if self.grid is None or not self.grid.is_current(game_map):
+            self.grid = PassabilityGrid(game_map)
+        return self.grid
+
+    def find_path(self, game_map, start_pos, goal_pos):
+        grid = self.grid_for(game_map)
+        if not grid.in_bounds(*start_pos) or not grid.in_bounds(*goal_pos):
+            return None
+        came_from = self.search(grid, grid.encode(*start_pos), grid.encode(*goal_pos))
+        if came_from is None:
+            return None
+        return self.reconstruct(grid, came_from, grid.encode(*goal_pos))
+
+    @abstractmethod
+    def search(self, grid, start, goal):
+        # came_from for the cells reached from start, keyed by encoded cell, or None if goal is unreachable
+        pass
+
+    def reconstruct(self, grid, came_from, goal):
+        nodes = [goal]
+        while came_from[nodes[-1]] is not None:
+            nodes.append(came_from[nodes[-1]])
+        nodes.reverse()
+        path = [grid.decode(nodes[0])]
+        for node in nodes[1:]:
+            # Jump points may be several cells apart, so walk the straight or diagonal segment between them
+            x, y = path[-1]
+            tx, ty = grid.decode(node)
+            dx, dy = (tx > x) - (tx < x), (ty > y) - (ty < y)
+            while (x, y) != (tx, ty):
+                x, y = x + dx, y + dy
+                path.append((x, y))
+        return path
+
+    @staticmethod
+    def heuristic(x1, y1, x2, y2):
+        # Chebyshev distance: diagonal steps cost the same as straight ones
+        return max(abs(x1 - x2), abs(y1 - y2))
+
+class AStarPathfinder(Pathfinder):
+    def search(self, grid, start, goal):
+        cells, offsets, stride = grid.cells, grid.offsets, grid.stride
+        goal_y, goal_x = divmod(goal, stride)
+        heuristic = self.heuristic
+        g_score = {start: 0}
+        came_from = {start: None}
+        closed = set()
+        # The open set is indexed by g_score, so membership and improvement checks are O(1);
+        # superseded heap entries are skipped when popped
+        open_heap = [(0, 0, start)]
+        while open_heap:
+            _, _, current = heapq.heappop(open_heap)
+            if current == goal:
+                return came_from
+            if current in closed:
+                continue
+            closed.add(current)
+            tentative_g_score = g_score[current] + 1
+            for offset in offsets:
+                neighbor = current + offset
+                if not cells[neighbor] or neighbor in closed:
+                    continue
+                if tentative_g_score >= g_score.get(neighbor, tentative_g_score + 1):
+                    continue
+                g_score[neighbor] = tentative_g_score
+                came_from[neighbor] = current
+                y, x = divmod(neighbor, stride)
+                h = heuristic(x, y, goal_x, goal_y)
+                heapq.heappush(open_heap, (tentative_g_score + h, h, neighbor))
+        return None
+
+class JumpPointPathfinder(Pathfinder):
+    # Jump Point Search for the uniform-cost 8-connected grid; moves may cut corners like A* does
+    def search(self, grid, start, goal):
+        cells, stride = grid.cells, grid.stride
+        goal_y, goal_x = divmod(goal, stride)
+        heuristic = self.heuristic
+        g_score = {start: 0}
+        came_from = {start: None}
+        closed = set()
+        open_heap = [(0, 0, start)]
+        while open_heap:
+            _, _, current = heapq.heappop(open_heap)
+            if current == goal:
+                return came_from
+            if current in closed:
+                continue
+            closed.add(current)
+            y, x = divmod(current, stride)
+            for dx, dy in self.directions(cells, stride, current, came_from[current]):
+                jump_point = self.jump(cells, stride, x, y, dx, dy, goal)
+                if jump_point is None or jump_point in closed:
+                    continue
+                jy, jx = divmod(jump_point, stride)
+                tentative_g_score = g_score[current] + max(abs(jx - x), abs(jy - y))
+                if tentative_g_score >= g_score.get(jump_point, tentative_g_score + 1):
+                    continue
+                g_score[jump_point] = tentative_g_score
+                came_from[jump_point] = current
+                h = heuristic(jx, jy, goal_x, goal_y)
+                heapq.heappush(open_heap, (tentative_g_score + h, h, jump_point))
+        return None
+
+    @staticmethod
+    def directions(cells, stride, current, parent):
+        if parent is None:
+            return NEIGHBORS
+        y, x = divmod(current, stride)
+        py, px = divmod(parent, stride)
+        dx, dy = (x > px) - (x < px), (y > py) - (y < py)
+        directions = []
+        if dx and dy:
+            directions += [(0, dy), (dx, 0), (dx, dy)]
+            if not cells[current - dx]:
+                directions.append((-dx, dy))
+            if not cells[current - dy * stride]:
+                directions.append((dx, -dy))
+        elif dx:
+            directions.append((dx, 0))
+            if not cells[current + stride]:
+                directions.append((dx, 1))
+            if not cells[current - stride]:
+                directions.append((dx, -1))
+        else:
+            directions.append((0, dy))
+            if not cells[current + 1]:
+                directions.append((1, dy))
+            if not cells[current - 1]:
+                directions.append((-1, dy))
+        return directions
+
+    def jump(self, cells, stride, x, y, dx, dy, goal):
+        step = dy * stride + dx
+        current = (y * stride + x) + step
+        while cells[current]:
+            if current == goal:
+                return current
+            if dx and dy:
+                if ((not cells[current - dx] and cells[current - dx + dy * stride]) or
+                        (not cells[current - dy * stride] and cells[current + dx - dy * stride])):
+                    return current
+                cy, cx = divmod(current, stride)
+                if (self.jump(cells, stride, cx, cy, dx, 0, goal) is not None or
+                        self.jump(cells, stride, cx, cy, 0, dy, goal) is not None):
+                    return current
+            elif dx:
+                if ((not cells[current + stride] and cells[current + stride + dx]) or
+                        (not cells[current - stride] and cells[current - stride + dx])):
+                    return current
+            else:
+                if ((not cells[current + 1] and cells[current + 1 + dy * stride]) or
+                        (not cells[current - 1] and cells[current - 1 + dy * stride])):
+                    return current
+            current += step
+        return None
+
+PATHFINDERS = {
+    'astar': AStarPathfinder,
+    'jps': JumpPointPathfinder,
+}
+
+def create_pathfinder(engine='astar'):
+    try:
+        return PATHFINDERS[engine]()
+    except KeyError:
+        raise ValueError(f"Unknown pathfinding engine: {engine}")
@@ -1,77 +1,234 @@
 import curses
+from operator import mul
 
-from classes.item import Equipment
+from classes.screen_buffer import ScreenBuffer
+from classes.tile_map import CHAR_TABLE, TILE_CHARS, WALL, DOOR
+
+PAD_MARGIN = 32  # Map cells the pad holds beyond each side of the viewport
 
 class Renderer:
     def __init__(self, game):
         self.game = game
+        self.screen = ScreenBuffer()
+        # The map view: a pad holding the map around the viewport, blitted through a viewport that follows the player,
+        # with the status bar and message log in windows of their own
+        self.map_view_active = False
+        self.layout_size = None
+        self.view_height = 0
+        self.view_width = 0
+        self.status_window = None
+        self.message_window = None
+        self.status_lines = None
+        self.message_lines = None
+        self.pad = None
+        self.pad_bounds = None
+        self.pad_rows = []
+        self.tile_colors = []
+        self.lit = set()  # Pad cells currently in the field of view
+        self.fov_version = None
+        self.cached_map = None
+        self.cached_map_version = None
+        self.overlay = []
+
+    def begin_screen(self, stdscr):
+        # Full-screen menus draw through the screen buffer, which cannot know what the map view left behind
+        if self.map_view_active:
+            self.map_view_active = False
+            self.screen.invalidate()
+        self.screen.begin(stdscr)
+
+    def layout(self, stdscr, height, width):
+        # Map viewport on top, status bar and message log at the bottom, with a spacer line between them
+        self.layout_size = (height, width)
+        self.view_height = max(1, height - 6)
+        self.view_width = width
+        self.status_window = curses.newwin(2, width, height - 6, 0)
+        self.message_window = curses.newwin(3, width, height - 3, 0)
+        self.status_lines = self.message_lines = None
+        self.cached_map = None  # The pad is sized to the viewport
+        self.clear_view(stdscr)
+
+    def clear_view(self, stdscr):
+        # Blanks what the pad does not cover and has every part of the view drawn again
+        stdscr.erase()
+        stdscr.noutrefresh()
+        if self.pad is not None:
+            self.pad.touchwin()
+        self.status_window.touchwin()
+        self.status_window.noutrefresh()
+        self.message_window.touchwin()
+        self.message_window.noutrefresh()
+
+    def update_pad(self, stdscr):
+        # The pad holds the map around the viewport as remembered: explored tiles dimmed, the rest blank.
+        # It is only rebuilt, centred on the viewport again, when the map changes or the viewport is
+        # about to leave it; the field of view relights cells on top of it
+        game = self.game
+        tile_map = game.map
+        camera_x, camera_y = self.camera()
+        if (self.cached_map is tile_map and self.cached_map_version == tile_map.version
+                and self.pad_covers(camera_x, camera_y)):
+            return
+        self.cached_map = tile_map
+        self.cached_map_version = tile_map.version
+        map_left, map_top, map_width, map_height = tile_map.active_bounds()
+        width = min(map_width, self.view_width + 2 * PAD_MARGIN)
+        height = min(map_height, self.view_height + 2 * PAD_MARGIN)
+        left = map_left + max(0, min(camera_x - map_left - PAD_MARGIN, map_width - width))
+        top = map_top + max(0, min(camera_y - map_top - PAD_MARGIN, map_height - height))
+        if self.pad is None or self.pad_bounds[2:] != (width, height):
+            # One spare row and column: curses refuses to write the last cell of a window
+            self.pad = curses.newpad(height + 1, width + 1)
+        self.pad_bounds = (left, top, width, height)
+        self.tile_colors = [curses.color_pair(1)] * len(TILE_CHARS)  # Default
+        self.tile_colors[WALL] = curses.color_pair(5)  # Walls
+        self.tile_colors[DOOR] = curses.color_pair(6)  # Doors
+        self.pad_rows = []
+        for y in range(height):
+            # Unexplored cells become VOID, which draws as a blank
+            ids = bytes(map(mul, tile_map.row_ids(top + y, left, width), game.explored.row_mask(top + y, left, width)))
+            chars = list(ids.translate(CHAR_TABLE).decode())
+            colors = [self.tile_colors[tile_id] for tile_id in ids]
+            self.pad_rows.append((chars, colors))
+            x = 0
+            while x < width:
+                end = x + 1
+                while end < width and colors[end] == colors[x]:
+                    end += 1
+                self.pad.addstr(y, x, ''.join(chars[x:end]), colors[x] | curses.A_DIM)
+                x = end
+        self.overlay = []
+        self.lit = set()
+        self.fov_version = None
+        self.clear_view(stdscr)
+
+    def draw_cell(self, x, y):
+        # Pad cell (x, y) as the map shows it: at full brightness while in view, dimmed from memory otherwise
+        chars, colors = self.pad_rows[y]
+        self.pad.addstr(y, x, chars[x], colors[x] if (x, y) in self.lit else colors[x] | curses.A_DIM)
+
+    def pad_covers(self, camera_x, camera_y):
+        # Whether the viewport at this camera position lies inside the pad
+        left, top, width, height = self.pad_bounds
+        return (left <= camera_x and camera_x + min(self.view_width, width) <= left + width
+                and top <= camera_y and camera_y + min(self.view_height, height) <= top + height)
+
+    def camera(self):
+        # Top-left map cell of the viewport: centred on the player, kept inside the loaded map
+        left, top, width, height = self.game.map.active_bounds()
+        player = self.game.player
+        x = left + max(0, min(player.x - left - self.view_width // 2, width - self.view_width))
+        y = top + max(0, min(player.y - top - self.view_height // 2, height - self.view_height))
+        return x, y
 
     def draw(self, stdscr):
-        stdscr.clear()
         height, width = stdscr.getmaxyx()
-        
-        # Adjust the height to reserve 3 lines for the message log and 3 lines for the status bar
-        dungeon_height = height - 6
-        
-        for y, row in enumerate(self.game.map[:dungeon_height]):
-            for x, cell in enumerate(row[:width]):  # Ensure we don't exceed the screen width
-                if cell == '#':
-                    stdscr.addch(y, x, cell, curses.color_pair(5))  # Walls
-                elif cell == '+':
-                    stdscr.addch(y, x, cell, curses.color_pair(6))  # Doors
-                else:
-                    stdscr.addch(y, x, cell, curses.color_pair(1))  # Default
-
-        for item in self.game.items:
-            if item.y < dungeon_height:
-                stdscr.addch(item.y, item.x, item.char, curses.color_pair(4))  # Items
-
-        for enemy in self.game.enemies:
-            if enemy.y < dungeon_height:
-                stdscr.addch(enemy.y, enemy.x, enemy.char, curses.color_pair(3))  # Monsters
-
-        if self.game.player.y < dungeon_height:
-            stdscr.addch(self.game.player.y, self.game.player.x, self.game.player.char, curses.color_pair(2))  # Player
+        if self.layout_size != (height, width):
+            self.layout(stdscr, height, width)
+        elif not self.map_view_active:
+            self.clear_view(stdscr)
+        self.map_view_active = True
+        self.update_pad(stdscr)
+        self.draw_map()
 
         # Status bar
-        stdscr.addstr(height - 6, 0, f"Health: {self.game.player.health}/{self.game.player.max_health} | Damage: {self.game.player.damage} | Defense: {self.game.player.defense}")
-        stdscr.addstr(height - 5, 0, f"Level: {self.game.player.level} | XP: {self.game.player.xp}/{self.game.player.xp_to_next_level} | Dungeon Level: {self.game.dungeon_level}")
+        player = self.game.player
+        self.draw_lines(self.status_window, "status_lines", (
+            f"Health: {player.health}/{player.max_health} | Damage: {player.damage} | Defense: {player.defense}",
+            f"Level: {player.level} | XP: {player.xp}/{player.xp_to_next_level} | Dungeon Level: {self.game.dungeon_level}",
+        ))
 
         # Messages
-        for i, message in enumerate(self.game.messages[-3:]):
-            if message is not None and height - 3 + i < height:  # Ensure we don't write outside the window height
-                stdscr.addstr(height - 3 + i, 0, str(message)[:width])  # Convert to string and truncate if too long
-
-        stdscr.refresh()
+        self.draw_lines(self.message_window, "message_lines",
+                        tuple(str(message) for message in self.game.messages[-3:] if message is not None))
+
+        curses.doupdate()
+
+    def draw_map(self):
+        game = self.game
+        pad = self.pad
+        left, top, width, height = self.pad_bounds
+        # Put back the tiles under last frame's items and monsters
+        for x, y in self.overlay:
+            self.draw_cell(x, y)
+        fov = game.fov
+        if self.fov_version != fov.version:
+            # Relight only the cells that entered or left the field of view
+            self.fov_version = fov.version
+            lit = {(x - left, y - top) for x, y in fov.cells if 0 <= x - left < width and 0 <= y - top < height}
+            entered, left_view = lit - self.lit, self.lit - lit
+            self.lit = lit
+            for x, y in entered:
+                tile_id = game.map.tile_id(x + left, y + top)
+                chars, colors = self.pad_rows[y]
+                chars[x], colors[x] = TILE_CHARS[tile_id], self.tile_colors[tile_id]
+            for x, y in entered | left_view:
+                self.draw_cell(x, y)
+        # Items and monsters only show while in view, so the visible cells are all that need looking at
+        overlay = []
+        spatial_index = game.spatial_index
+        for x, y in fov.cells:
+            enemy = spatial_index.entity_at(x, y)
+            if enemy is not None:
+                char, attr = enemy.char, curses.color_pair(3)  # Monsters
+            else:
+                items = spatial_index.items_at(x, y)
+                if not items:
+                    continue
+                char, attr = items[0].char, curses.color_pair(4)  # Items
+            if 0 <= x - left < width and 0 <= y - top < height:
+                pad.addstr(y - top, x - left, char, attr)
+                overlay.append((x - left, y - top))
+        player = game.player
+        x, y = player.x - left, player.y - top
+        if 0 <= x < width and 0 <= y < height:
+            pad.addstr(y, x, player.char, curses.color_pair(2))  # Player
+            overlay.append((x, y))
+        self.overlay = overlay
+        camera_x, camera_y = self.camera()
+        pad.noutrefresh(camera_y - top, camera_x - left, 0, 0,
+                        min(self.view_height, height) - 1, min(self.view_width, width) - 1)
+
+    def draw_lines(self, window, cache, lines):
+        # Windows are only rewritten when their text changed
+        if getattr(self, cache) == lines:
+            return
+        setattr(self, cache, lines)
+        window.erase()
+        width = window.getmaxyx()[1]
+        for y, line in enumerate(lines):
+            try:
+                window.addstr(y, 0, line[:width])
+            except curses.error:
+                # Filling the last cell of the window moves the cursor out of it; the text is still drawn
+                pass
+        window.noutrefresh()
 
     def draw_inventory(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
 
         header = "Inventory (press escape to exit, '+' for next page, '-' for previous page)"
-        stdscr.addstr(0, 0, header[:width-1])
-
-        inventory_items = self.game.player.get_inventory_items()
-        start_index = self.game.inventory_page * self.game.items_per_page
-        end_index = start_index + self.game.items_per_page
+        self.screen.put(0, 0, header[:width-1])
 
-        for i, (item, count) in enumerate(inventory_items[start_index:end_index], start=0):
+        inventory = self.game.player.inventory
+        for i, (item, count) in enumerate(inventory.page(self.game.inventory_page, self.game.items_per_page)):
             key = chr(97 + i)  # a-z
             item_str = f"{key}) {item.name} [{count}]"
-            stdscr.addstr(i + 2, 0, item_str[:width-1])
+            self.screen.put(i + 2, 0, item_str[:width-1])
 
-        total_pages = max(1, (len(inventory_items) - 1) // self.game.items_per_page + 1)
+        total_pages = inventory.page_count(self.game.items_per_page)
         footer = f"Page {self.game.inventory_page + 1}/{total_pages}"
-        stdscr.addstr(height - 1, 0, footer[:width-1])
+        self.screen.put(height - 1, 0, footer[:width-1])
 
-        stdscr.refresh()
+        self.screen.present(stdscr)
 
     def draw_character_screen(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
         
         header = "Character Information (press escape to exit)"
-        stdscr.addstr(0, 0, header[:width-1])
+        self.screen.put(0, 0, header[:width-1])
 
         # Left column: Basic Info
         left_column = [
@@ -121,86 +278,78 @@ class Renderer:
         for i, line in enumerate(left_column, start=2):
             if i >= height:
                 break
-            stdscr.addstr(i, 0, line[:left_width])
+            self.screen.put(i, 0, line[:left_width])
 
         # Draw right column
         for i, line in enumerate(right_column, start=2):
             if i >= height:
                 break
-            stdscr.addstr(i, left_width + 2, line[:right_width])
+            self.screen.put(i, left_width + 2, line[:right_width])
 
-        stdscr.refresh()
+        self.screen.present(stdscr)
 
     def draw_backpack(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
         
         header = "Backpack Items (press '+' for next page, '-' for previous page, escape to exit)"
-        stdscr.addstr(0, 0, header[:width-1])
-
-        backpack_items = self.game.player.get_inventory_items()
-        items_per_page = self.game.items_per_page
-        start_index = self.game.backpack_page * items_per_page
-        end_index = start_index + items_per_page
+        self.screen.put(0, 0, header[:width-1])
 
-        for i, (item, count) in enumerate(backpack_items[start_index:end_index], start=0):
+        inventory = self.game.player.inventory
+        for i, (item, count) in enumerate(inventory.page(self.game.backpack_page, self.game.items_per_page)):
             key = chr(97 + i)  # a-z
             item_str = f"{key}) {item.name} [{count}]"
-            stdscr.addstr(i + 2, 0, item_str[:width-1])
+            self.screen.put(i + 2, 0, item_str[:width-1])
 
-        total_pages = (len(backpack_items) - 1) // items_per_page + 1
+        total_pages = inventory.page_count(self.game.items_per_page)
         footer = f"Page {self.game.backpack_page + 1}/{total_pages}"
-        stdscr.addstr(height - 1, 0, footer[:width-1])
+        self.screen.put(height - 1, 0, footer[:width-1])
 
-        stdscr.refresh()
+        self.screen.present(stdscr)
 
     def draw_drop_interface(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
         
         header = "Drop Items (press '+' for next page, '-' for previous page, escape to exit)"
-        stdscr.addstr(0, 0, header[:width-1])
+        self.screen.put(0, 0, header[:width-1])
 
-        backpack_items = self.game.player.get_inventory_items()
-        items_per_page = self.game.items_per_page
-        start_index = self.game.backpack_page * items_per_page
-        end_index = start_index + items_per_page
-
-        for i, (item, count) in enumerate(backpack_items[start_index:end_index], start=0):
+        inventory = self.game.player.inventory
+        for i, (item, count) in enumerate(inventory.page(self.game.backpack_page, self.game.items_per_page)):
             key = chr(97 + i)  # a-z
             item_str = f"{key}) {item.name} [{count}]"
-            stdscr.addstr(i + 2, 0, item_str[:width-1])
+            self.screen.put(i + 2, 0, item_str[:width-1])
 
-        total_pages = (len(backpack_items) - 1) // items_per_page + 1
+        total_pages = inventory.page_count(self.game.items_per_page)
         footer = f"Page {self.game.backpack_page + 1}/{total_pages}"
-        stdscr.addstr(height - 1, 0, footer[:width-1])
+        self.screen.put(height - 1, 0, footer[:width-1])
 
-        stdscr.refresh()
+        self.screen.present(stdscr)
 
     def draw_equipment_screen(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
 
-        stdscr.addstr(0, 0, "Equipment:")
+        self.screen.put(0, 0, "Equipment:")
         for i, (key, slot) in enumerate(self.game.player.equipment.items()):
             item = slot['item']
             item_name = item.name if item else "Empty"
-            stdscr.addstr(i + 2, 0, f"{key}: {slot['name']}: {item_name}")
+            self.screen.put(i + 2, 0, f"{key}: {slot['name']}: {item_name}")
 
             # Display equippable items for each slot
-            equippable_items = [item for item in self.game.player.inventory if isinstance(item, Equipment) and item.slot == slot['name']]
+            equippable_items = self.game.player.inventory.equippable(slot['name'])
             if equippable_items:
-                stdscr.addstr(i + 2, 40, f"Equippable: {', '.join(item.name for item in equippable_items)}")
+                self.screen.put(i + 2, 40, f"Equippable: {', '.join(item.name for item in equippable_items)}")
 
-        stdscr.addstr(height - 1, 0, "Press the letter of a slot to equip an item, or 'q' to exit")
-        stdscr.refresh()
+        self.screen.put(height - 1, 0, "Press the letter of a slot to equip an item, or 'q' to exit")
+        self.screen.present(stdscr)
 
     def draw_character_stats_screen(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
 
         header = "Character Stats (press escape to exit)"
-        stdscr.addstr(0, 0, header[:width-1])
+        self.screen.put(0, 0, header[:width-1])
 
         # Attribute Scores
         attributes = [
@@ -232,18 +381,30 @@ class Renderer:
         for i, line in enumerate(attributes, start=2):
             if i >= height:
                 break
-            stdscr.addstr(i, 0, line[:width-1])
+            self.screen.put(i, 0, line[:width-1])
 
         # Draw miscellaneous data
         for i, line in enumerate(misc_data, start=2):
             if i >= height:
                 break
-            stdscr.addstr(i, width // 2, line[:width-1])
+            self.screen.put(i, width // 2, line[:width-1])
+
+        self.screen.present(stdscr)
+
+    def draw_message_log(self, stdscr):
+        self.begin_screen(stdscr)
+        _, width = stdscr.getmaxyx()
+
+        header = "Message log (up/down or j/k to scroll, '+'/'-' for pages, escape to exit)"
+        self.screen.put(0, 0, header[:width-1])
+
+        for i, line in enumerate(self.game.messages.lines(self.game.message_log_top, self.game.message_log_page())):
+            self.screen.put(i + 2, 0, line[:width-1])
 
-        stdscr.refresh()
+        self.screen.present(stdscr)
 
     def draw_debug_menu(self, stdscr):
-        stdscr.clear()
+        self.begin_screen(stdscr)
         height, width = stdscr.getmaxyx()
 
         menu_text = [
@@ -254,6 +415,6 @@ class Renderer:
         ]
 
         for i, line in enumerate(menu_text):
-            stdscr.addstr(i, 0, line[:width-1])
+            self.screen.put(i, 0, line[:width-1])
 
-        stdscr.refresh()
+        self.screen.present(stdscr)
@@ -0,0 +1,123 @@
+import argparse
+import hashlib
+import sys
+import time
+
+from classes.headless import HeadlessEngine, parse_command
+
+REPLAY_HEADER = "# pRogue replay v1"
+CHECKPOINT_EVERY = 1000  # Keys between state hashes in a recording
+
+def state_hash(game):
+    # Digest of everything the rules depend on; two runs that agree here will keep agreeing
+    player = game.player
+    digest = hashlib.blake2b(digest_size=16)
+    # Chunked worlds are fully described by their packed form; unloaded chunks have no tiles to hash
+    digest.update(game.map.pack() if game.chunked else bytes(game.map.tiles))
+    digest.update(repr((
+        game.turn_count, game.dungeon_level,
+        (player.x, player.y, player.health, player.max_health, player.level, player.xp,
+         player.base_damage, player.base_defense, player.money),
+        sorted((item.name, count) for item, count in player.inventory.items()),
+        [slot['item'].name if slot['item'] else None for slot in player.equipment.values()],
+        [(enemy.x, enemy.y, enemy.health) for enemy in game.enemies],
+        [(item.x, item.y, item.name) for item in game.items],
+        game.rng.getstate(),
+    )).encode())
+    return digest.hexdigest()
+
+class InputRecorder:
+    # Writes the seed, the map size and every key as a text file the replayer (or the headless
+    # engine) can run; a state hash is added every `checkpoint_every` keys
+    def __init__(self, stream, game, checkpoint_every=CHECKPOINT_EVERY):
+        self.stream = stream
+        self.checkpoint_every = checkpoint_every
+        self.keys = 0
+        stream.write(f"{REPLAY_HEADER}\nseed {game.seed}\nsize {game.height} {game.width}\n")
+        if game.chunked or not game.fit_screen:
+            stream.write(f"world {'chunked' if game.chunked else 'whole'} {'fit' if game.fit_screen else 'free'}\n")
+        if game.algorithm != 'rooms':
+            stream.write(f"algorithm {game.algorithm}\n")
+
+    def record(self, key, game):
+        # Called after the game has handled the key, so checkpoints hash the resulting state
+        self.keys += 1
+        self.stream.write(f"key {key}\n")
+        if self.keys % self.checkpoint_every == 0:
+            self.checkpoint(game)
+
+    def checkpoint(self, game):
+        self.stream.write(f"check {self.keys} {state_hash(game)}\n")
+
+    def close(self, game):
+        if self.keys % self.checkpoint_every:
+            self.checkpoint(game)
+        self.stream.close()
+
+def load_replay(lines):
+    # Returns the seed, map size, commands and any Game options the recording was made with
+    seed, height, width = None, 21, 80
+    options = {}
+    commands = []
+    for line in lines:
+        command = parse_command(line)
+        if command is None:
+            continue
+        if command[0] == 'seed':
+            seed = line.split(None, 1)[1].strip()
+        elif command[0] == 'size':
+            height, width = int(command[1]), int(command[2])
+        elif command[0] == 'world':
+            options.update(chunked=command[1] == 'chunked', fit_screen=command[2] == 'fit')
+        elif command[0] == 'algorithm':
+            options['algorithm'] = command[1]
+        else:
+            commands.append(command)
+    if seed is None:
+        raise ValueError("Replay has no seed")
+    return seed, height, width, commands, options
+
+def run_replay(seed, height, width, commands, verify=True, options=None):
+    # Re-simulates the recording headless, as fast as the rules run; returns the engine and
+    # the number of checkpoints matched
+    engine = HeadlessEngine(height, width, seed=seed, **(options or {}))
+    checked = 0
+    for command in commands:
+        if command[0] == 'check':
+            if verify:
+                expected = command[2]
+                actual = state_hash(engine.game)
+                if actual != expected:
+                    raise ValueError(f"Replay diverged by key {command[1]}: expected {expected}, got {actual}")
+                checked += 1
+        else:
+            # The recording ends where the player quit, so the quit signal needs no handling here
+            engine.execute(*command)
+    return engine, checked
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded game without a terminal.")
+    parser.add_argument('replay', help="recording made with pRoguelike.py --record ('-' for stdin)")
+    parser.add_argument('--no-verify', action='store_true', help="skip the state hash checkpoints")
+    args = parser.parse_args(argv)
+
+    stream = sys.stdin if args.replay == '-' else open(args.replay)
+    with stream:
+        seed, height, width, commands, options = load_replay(stream)
+
+    start = time.perf_counter()
+    try:
+        engine, checked = run_replay(seed, height, width, commands, verify=not args.no_verify, options=options)
+    except ValueError as error:
+        print(error)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    game = engine.game
+    print(f"Keys: {engine.commands_run}  Checkpoints: {checked}  Turns: {game.turn_count}  "
+          f"Dungeon level: {game.dungeon_level}  Health: {game.player.health}/{game.player.max_health}")
+    print(f"Elapsed: {elapsed:.3f}s  ({engine.commands_run / elapsed if elapsed else 0:.0f} keys/s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
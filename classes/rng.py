@@ -0,0 +1,20 @@
+import random
+
+# One stream per subsystem, so extra draws in one (a new item, a bigger map) do not shift the others
+STREAMS = ('map', 'spawn', 'loot', 'combat', 'player')
+
+class RandomStreams:
+    def __init__(self, seed=None):
+        if seed is None:
+            # Unseeded games still take their seed from the module RNG, so random.seed() keeps working
+            seed = random.getrandbits(63)
+        self.seed = seed
+        for name in STREAMS:
+            setattr(self, name, random.Random(f"{seed}:{name}"))
+
+    def getstate(self):
+        return {name: getattr(self, name).getstate() for name in STREAMS}
+
+    def setstate(self, state):
+        for name in STREAMS:
+            getattr(self, name).setstate(state[name])
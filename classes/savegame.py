@@ -0,0 +1,257 @@
+import mmap
+import struct
+import zlib
+from operator import attrgetter
+
+from classes.chunked_map import ChunkedMap
+from classes.entity import Entity
+from classes.fov import ExploredTiles
+from classes.game import Game
+from classes.item_loader import catalog
+from classes.rng import RandomStreams
+from classes.tile_map import TileMap
+
+# File layout (little-endian):
+#   tiles      width * height tile ids, first in the file so the loader can memory-map them as is
+#              (empty for chunked worlds, whose packed form follows LEVELS_RECORD instead)
+#   game       GAME_RECORD, then rooms as ROOM_RECORDs
+#   strings    every piece of text (seed, names, ...) once; records refer to them by index
+#   entities   player, then enemies: ENTITY_RECORD, then its inventory and temporary boosts
+#   items      floor items as ITEM_RECORD (catalog id, position, quantity)
+#   levels     LEVELS_RECORD, SECTION_LENGTH and the packed world for chunked maps,
+#              then every other visited level as PACKED_LEVEL and its packed bytes
+#   explored   SECTION_LENGTH, then the current level's explored cells
+#   trailer    TRAILER, read first to find and check everything else
+SAVE_MAGIC = b'PRSV'
+SAVE_VERSION = 1
+READABLE_VERSIONS = (1,)
+TRAILER = struct.Struct('<4sHIIIIII')  # magic, version, map width, map height, game height, game width, body offset, catalog checksum
+GAME_RECORD = struct.Struct('<IIIiiiiIIIIHH')  # turns, last spawn turn, dungeon level, stairs up/down, room/enemy/item/string counts, seed, map algorithm
+ROOM_RECORD = struct.Struct('<iiii')
+ITEM_RECORD = struct.Struct('<Hiii')
+COUNT = struct.Struct('<H')
+STACK_RECORD = struct.Struct('<HH')  # catalog id, quantity
+BOOST_RECORD = struct.Struct('<Hii')  # stat, value, duration
+LEVELS_RECORD = struct.Struct('<IB')  # stored level count, MAP_EDITED | CHUNKED | FREE_SIZE flags
+MAP_EDITED, CHUNKED, FREE_SIZE = 1, 2, 4  # FREE_SIZE: levels are not clamped to the terminal
+SECTION_LENGTH = struct.Struct('<I')  # size of a variable-length section
+PACKED_LEVEL = struct.Struct('<II')  # dungeon level, packed size
+
+# Positions are stored from the attributes behind the x/y properties so records can be applied in one update
+ENTITY_FIELDS = (
+    ('_x', 'i'), ('_y', 'i'), ('health', 'i'), ('max_health', 'i'), ('base_damage', 'i'), ('base_defense', 'i'),
+    ('level', 'i'), ('xp', 'q'), ('xp_to_next_level', 'q'), ('strength', 'i'), ('dexterity', 'i'),
+    ('constitution', 'i'), ('intelligence', 'i'), ('willpower', 'i'), ('charisma', 'i'), ('appearance', 'i'),
+    ('perception', 'i'), ('speed', 'i'), ('max_mana', 'i'), ('mana', 'i'), ('max_psi', 'i'), ('psi', 'i'),
+    ('money', 'q'), ('age', 'i'),
+)
+ENTITY_TEXT = ('char', 'name', 'deity', 'birth', 'month', 'day')
+SLOT_KEYS = tuple(Entity(0, 0, '', '', 0, 0, 0).equipment)
+# Numbers, string indices, one catalog id per equipment slot, inventory and boost counts
+ENTITY_RECORD = struct.Struct('<' + ''.join(code for _, code in ENTITY_FIELDS) + 'H' * len(ENTITY_TEXT)
+                              + 'H' * len(SLOT_KEYS) + 'HH')
+ENTITY_FIELD_NAMES = tuple(name for name, _ in ENTITY_FIELDS)
+ENTITY_VALUES = attrgetter(*ENTITY_FIELD_NAMES)
+ENTITY_STRINGS = attrgetter(*ENTITY_TEXT)
+EMPTY_SLOT = 0xFFFF
+
+# Items are stored by their index in the catalog; the checksum catches saves from a different catalog
+CATALOG_CHECKSUM = zlib.crc32("\n".join(prototype.name for prototype in catalog.prototypes).encode())
+
+def catalog_id(item):
+    try:
+        return catalog.by_name[item.name].index
+    except KeyError:
+        raise ValueError(f"Cannot save {item.name}: it is not in the item catalog") from None
+
+def new_item(index):
+    # Floor items need their own instances; carried items share the catalog ones like starting gear does
+    return catalog[index].create()
+
+class StringTable:
+    def __init__(self):
+        self.indices = {}
+
+    def index(self, text):
+        text = str(text)
+        index = self.indices.get(text)
+        if index is None:
+            index = self.indices[text] = len(self.indices)
+        return index
+
+    def pack(self):
+        parts = []
+        for text in self.indices:
+            data = text.encode()
+            parts.append(COUNT.pack(len(data)) + data)
+        return b''.join(parts)
+
+def pack_entity(entity, strings):
+    inventory = entity.inventory.items()
+    boosts = list(getattr(entity, 'temporary_boosts', {}).items())
+    parts = [ENTITY_RECORD.pack(
+        *ENTITY_VALUES(entity),
+        *(strings.index(text) for text in ENTITY_STRINGS(entity)),
+        *(catalog_id(slot['item']) if slot['item'] else EMPTY_SLOT for slot in entity.equipment.values()),
+        len(inventory), len(boosts),
+    )]
+    parts.extend(STACK_RECORD.pack(catalog_id(item), count) for item, count in inventory)
+    parts.extend(BOOST_RECORD.pack(strings.index(stat), boost['value'], entity.boost_turns_left(stat)) for stat, boost in boosts)
+    return b''.join(parts)
+
+def save_game(game, path):
+    tile_map = game.map
+    strings = StringTable()
+    seed = strings.index(game.seed)
+    algorithm = strings.index(game.algorithm)
+    entities = [pack_entity(game.player, strings)]
+    entities.extend(pack_entity(enemy, strings) for enemy in game.enemies)
+    parts = [
+        GAME_RECORD.pack(game.turn_count, game.last_spawn_turn, game.dungeon_level,
+                         game.stairs_up_x, game.stairs_up_y, game.stairs_x, game.stairs_y,
+                         len(game.rooms), len(game.enemies), len(game.items), len(strings.indices), seed, algorithm),
+        b''.join(ROOM_RECORD.pack(*room) for room in game.rooms),
+        strings.pack(),
+        b''.join(entities),
+        b''.join(ITEM_RECORD.pack(catalog_id(item), item.x, item.y, item.quantity) for item in game.items),
+    ]
+    levels = game.level_store.packed_levels(game)
+    flags = MAP_EDITED if tile_map.version != game.generated_map_version else 0
+    if not game.fit_screen:
+        flags |= FREE_SIZE
+    if game.chunked:
+        world = tile_map.pack()
+        parts.append(LEVELS_RECORD.pack(len(levels), flags | CHUNKED) + SECTION_LENGTH.pack(len(world)) + world)
+        tiles = b''
+    else:
+        parts.append(LEVELS_RECORD.pack(len(levels), flags))
+        tiles = tile_map.tiles
+    for dungeon_level, packed in levels.items():
+        parts.append(PACKED_LEVEL.pack(dungeon_level, len(packed)) + packed)
+    explored = zlib.compress(game.explored.pack())
+    parts.append(SECTION_LENGTH.pack(len(explored)) + explored)
+    body_offset = len(tiles)
+    with open(path, 'wb') as file:
+        file.write(tiles)
+        file.write(b''.join(parts))
+        file.write(TRAILER.pack(SAVE_MAGIC, SAVE_VERSION, tile_map.width, tile_map.height,
+                                game.height, game.width, body_offset, CATALOG_CHECKSUM))
+
+def unpack_strings(data, offset, count):
+    strings = []
+    for _ in range(count):
+        (length,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        strings.append(data[offset:offset + length].decode())
+        offset += length
+    return strings, offset
+
+def unpack_entity(data, offset, entity, strings):
+    # Writes straight into the instance, so entities must not be in a spatial index yet
+    record = ENTITY_RECORD.unpack_from(data, offset)
+    offset += ENTITY_RECORD.size
+    field_count, text_count = len(ENTITY_FIELDS), len(ENTITY_TEXT)
+    state = entity.__dict__
+    state.update(zip(ENTITY_FIELD_NAMES, record))
+    state.update(zip(ENTITY_TEXT, (strings[index] for index in record[field_count:field_count + text_count])))
+    slots = record[field_count + text_count:-2]
+    for key, index in zip(SLOT_KEYS, slots):
+        if index != EMPTY_SLOT:
+            entity.equipment[key]['item'] = catalog.shared(index)
+    inventory_count, boost_count = record[-2:]
+    for index, quantity in STACK_RECORD.iter_unpack(data[offset:offset + inventory_count * STACK_RECORD.size]):
+        entity.inventory.add(catalog.shared(index), quantity)
+    offset += inventory_count * STACK_RECORD.size
+    # Boosts are stored with the turns they have left and rescheduled on the entity's timers
+    for stat, value, duration in BOOST_RECORD.iter_unpack(data[offset:offset + boost_count * BOOST_RECORD.size]):
+        entity.apply_temporary_boost(strings[stat], value, duration)
+    entity.invalidate_stats()
+    return offset + boost_count * BOOST_RECORD.size
+
+def load_game(path, stdscr=None, use_mmap=True, pregenerate=False):
+    with open(path, 'rb') as file:
+        file.seek(0, 2)
+        size = file.tell()
+        if size < TRAILER.size:
+            raise ValueError(f"{path} is not a save file")
+        file.seek(size - TRAILER.size)
+        magic, version, map_width, map_height, height, width, body_offset, checksum = TRAILER.unpack(file.read(TRAILER.size))
+        if magic != SAVE_MAGIC:
+            raise ValueError(f"{path} is not a save file")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"{path} is save version {version}; this game reads versions {READABLE_VERSIONS}")
+        if checksum != CATALOG_CHECKSUM:
+            raise ValueError(f"{path} was saved with a different item catalog")
+        if not body_offset:
+            tiles = None
+        elif use_mmap:
+            # Copy-on-write mapping: the game can change tiles without touching the file
+            tiles = mmap.mmap(file.fileno(), body_offset, access=mmap.ACCESS_COPY)
+        else:
+            file.seek(0)
+            tiles = bytearray(file.read(body_offset))
+        file.seek(body_offset)
+        data = file.read(size - TRAILER.size - body_offset)
+
+    (turn_count, last_spawn_turn, dungeon_level, stairs_up_x, stairs_up_y, stairs_x, stairs_y,
+     room_count, enemy_count, item_count, string_count, seed, algorithm) = GAME_RECORD.unpack_from(data, 0)
+    offset = GAME_RECORD.size
+    rooms = list(ROOM_RECORD.iter_unpack(data[offset:offset + room_count * ROOM_RECORD.size]))
+    offset += room_count * ROOM_RECORD.size
+    strings, offset = unpack_strings(data, offset, string_count)
+    seed = strings[seed]
+
+    # Visited levels are rebuilt from their seed, so they need the algorithm that first built them
+    game = Game(height, width, stdscr, seed=seed, generate=False, pregenerate=pregenerate,
+                algorithm=strings[algorithm])
+    if tiles is not None:
+        game.map = TileMap(map_width, map_height, tiles=tiles)
+    game.rooms = rooms
+    game.turn_count, game.last_spawn_turn, game.dungeon_level = turn_count, last_spawn_turn, dungeon_level
+    game.start_timers()
+    game.stairs_up_x, game.stairs_up_y, game.stairs_x, game.stairs_y = stairs_up_x, stairs_up_y, stairs_x, stairs_y
+    player = game.player
+    player.inventory.clear()
+    for slot in player.equipment.values():
+        slot['item'] = None
+    offset = unpack_entity(data, offset, player, strings)
+    for _ in range(enemy_count):
+        enemy = Entity(0, 0, '', '', 0, 0, 0)
+        enemy.timers = game.timers
+        offset = unpack_entity(data, offset, enemy, strings)
+        game.add_enemy(enemy)
+    for index, x, y, quantity in ITEM_RECORD.iter_unpack(data[offset:offset + item_count * ITEM_RECORD.size]):
+        item = new_item(index)
+        item.set_position(x, y)
+        item.quantity = quantity
+        game.add_floor_item(item)
+    offset += item_count * ITEM_RECORD.size
+    level_count, flags = LEVELS_RECORD.unpack_from(data, offset)
+    offset += LEVELS_RECORD.size
+    if flags & FREE_SIZE:
+        # Levels generated from here on keep the saved size instead of fitting this terminal
+        game.fit_screen = False
+        game.screen_height = game.screen_width = None
+    if flags & CHUNKED:
+        (length,) = SECTION_LENGTH.unpack_from(data, offset)
+        offset += SECTION_LENGTH.size
+        game.chunked = True
+        game.map = ChunkedMap.unpack(data[offset:offset + length])
+        offset += length
+    for _ in range(level_count):
+        dungeon_level, length = PACKED_LEVEL.unpack_from(data, offset)
+        offset += PACKED_LEVEL.size
+        game.level_store.packed[dungeon_level] = data[offset:offset + length]
+        offset += length
+    (length,) = SECTION_LENGTH.unpack_from(data, offset)
+    offset += SECTION_LENGTH.size
+    game.explored = ExploredTiles.unpack(zlib.decompress(data[offset:offset + length]))
+    offset += length
+    game.generated_map_version = None if flags & MAP_EDITED else game.map.version
+    # Generator states are not stored; the streams restart from the seed and the turn of the save,
+    # so loading the same file always plays out the same way
+    game.attach_rng(RandomStreams(f"{seed}:save:{turn_count}"))
+    game.load_chunks()
+    game.update_fov()
+    game.level_store.prefetch(game)
+    return game
@@ -0,0 +1,75 @@
+import curses
+
+class ScreenBuffer:
+    # Frames are composed off-screen and compared with the previous frame, so only
+    # damaged cells are sent to curses, grouped into runs that share an attribute
+    def __init__(self):
+        self.height = 0
+        self.width = 0
+        self.chars = []
+        self.attrs = []
+        self.front_chars = []
+        self.front_attrs = []
+
+    def begin(self, stdscr):
+        height, width = stdscr.getmaxyx()
+        if (height, width) != (self.height, self.width):
+            self.height, self.width = height, width
+            self.invalidate()
+            stdscr.erase()
+        self.chars = [[' '] * width for _ in range(height)]
+        self.attrs = [[0] * width for _ in range(height)]
+
+    def invalidate(self):
+        # Forces every row to be redrawn on the next present()
+        self.front_chars = [None] * self.height
+        self.front_attrs = [None] * self.height
+
+    def put(self, y, x, text, attr=0):
+        if not 0 <= y < self.height or x >= self.width:
+            return
+        text = text[:self.width - x]
+        self.chars[y][x:x + len(text)] = text
+        self.attrs[y][x:x + len(text)] = [attr] * len(text)
+
+    def put_char(self, y, x, char, attr=0):
+        if 0 <= y < self.height and 0 <= x < self.width:
+            self.chars[y][x] = char
+            self.attrs[y][x] = attr
+
+    def blit_row(self, y, chars, attrs):
+        # Copies a prepared row of characters and attributes, e.g. a cached map row
+        if 0 <= y < self.height:
+            length = min(len(chars), self.width)
+            self.chars[y][:length] = chars[:length]
+            self.attrs[y][:length] = attrs[:length]
+
+    def present(self, stdscr):
+        for y in range(self.height):
+            chars, attrs = self.chars[y], self.attrs[y]
+            front_chars, front_attrs = self.front_chars[y], self.front_attrs[y]
+            if chars == front_chars and attrs == front_attrs:
+                continue
+            if front_chars is None:
+                front_chars, front_attrs = [None] * self.width, [None] * self.width
+            x = 0
+            while x < self.width:
+                if chars[x] == front_chars[x] and attrs[x] == front_attrs[x]:
+                    x += 1
+                    continue
+                # Extend the run over cells with the same attribute, then drop its unchanged tail
+                attr = attrs[x]
+                end = x + 1
+                while end < self.width and attrs[end] == attr:
+                    end += 1
+                while chars[end - 1] == front_chars[end - 1] and attrs[end - 1] == front_attrs[end - 1]:
+                    end -= 1
+                try:
+                    stdscr.addstr(y, x, ''.join(chars[x:end]), attr)
+                except curses.error:
+                    # Writing the bottom-right cell moves the cursor off-screen; the text is still drawn
+                    pass
+                x = end
+        self.front_chars, self.front_attrs = self.chars, self.attrs
+        stdscr.noutrefresh()
+        curses.doupdate()
@@ -0,0 +1,51 @@
+class SpatialIndex:
+    # Objects are bucketed by (x, y) in one layer per kind; each object names its layer
+    # in `spatial_layer` and reports its own moves back through `spatial_index`
+    def __init__(self):
+        self.layers = {'entities': {}, 'items': {}}
+
+    def add(self, obj):
+        obj.spatial_index = self
+        self._insert(obj)
+
+    def remove(self, obj):
+        self._discard(obj, (obj.x, obj.y))
+        obj.spatial_index = None
+
+    def move(self, obj, old_position):
+        self._discard(obj, old_position)
+        self._insert(obj)
+
+    def clear(self):
+        for layer in self.layers.values():
+            for cell in layer.values():
+                for obj in cell:
+                    obj.spatial_index = None
+            layer.clear()
+
+    def entities_at(self, x, y):
+        return self.layers['entities'].get((x, y), ())
+
+    def entity_at(self, x, y):
+        cell = self.layers['entities'].get((x, y))
+        return cell[0] if cell else None
+
+    def items_at(self, x, y):
+        return self.layers['items'].get((x, y), ())
+
+    def _insert(self, obj):
+        if obj.x is not None and obj.y is not None:
+            self.layers[obj.spatial_layer].setdefault((obj.x, obj.y), []).append(obj)
+
+    def _discard(self, obj, position):
+        layer = self.layers[obj.spatial_layer]
+        cell = layer.get(position)
+        if not cell:
+            return
+        # Items compare equal by name, so buckets are searched by identity
+        for i, other in enumerate(cell):
+            if other is obj:
+                del cell[i]
+                break
+        if not cell:
+            del layer[position]
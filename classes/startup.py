@@ -0,0 +1,46 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter for every sample, so each one pays for a cold start. The first frame is
+# everything the first draw needs from the rules: a new game, which has its field of view worked out.
+PROBE = """
+import time
+start = time.perf_counter()
+from classes.game import Game
+imported = time.perf_counter()
+game = Game({height}, {width}, seed={seed!r}, chunked={chunked})
+print(imported - start, time.perf_counter() - imported)
+"""
+
+def sample(height, width, seed, chunked):
+    # Seconds spent importing, building the first frame, and in the whole process
+    probe = PROBE.format(height=height, width=width, seed=seed, chunked=chunked)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    imported, first_frame = (float(value) for value in result.stdout.split())
+    return imported, first_frame, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time cold starts: imports and the first frame of a new game.")
+    parser.add_argument('--runs', type=int, default=20, help="fresh interpreters to time")
+    parser.add_argument('--height', type=int, default=21)
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--seed', default='startup')
+    parser.add_argument('--chunked', action='store_true', help="start in a height x width world generated in chunks")
+    args = parser.parse_args(argv)
+
+    samples = [sample(args.height, args.width, args.seed, args.chunked) for _ in range(args.runs)]
+    for label, values in zip(("Imports", "First frame", "Process"), zip(*samples)):
+        print(f"{label + ':':<13} median {statistics.median(values) * 1000:7.1f}ms  "
+              f"best {min(values) * 1000:7.1f}ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
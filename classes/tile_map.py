@@ -0,0 +1,166 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TILE_CHARS = ' #.+<>'
+TILE_IDS = {char: tile_id for tile_id, char in enumerate(TILE_CHARS)}
+
+VOID, WALL, FLOOR, DOOR, STAIRS_UP, STAIRS_DOWN = range(len(TILE_CHARS))
+
+# Per-tile property tables indexed by tile id
+PASSABLE = bytes(char in '.+<>' for char in TILE_CHARS)
+TRANSPARENT = bytes(char in '.<>' for char in TILE_CHARS)
+COST = bytes(1 if passable else 0 for passable in PASSABLE)
+
+def _translation(values):
+    return bytes(values) + bytes(256 - len(values))
+
+# bytes.translate() tables turning a run of tile ids into characters or property masks in one call
+CHAR_TABLE = _translation(TILE_CHARS.encode())
+PASSABLE_TABLE = _translation(PASSABLE)
+TRANSPARENT_TABLE = _translation(TRANSPARENT)
+
+class TileRow:
+    # Read-only view of one map row, so existing `map[y][x]` reads keep working
+    def __init__(self, tile_map, y):
+        self.tile_map = tile_map
+        self.start = y * tile_map.width
+
+    def __len__(self):
+        return self.tile_map.width
+
+    def __getitem__(self, x):
+        if isinstance(x, slice):
+            return list(self.text()[x])
+        if x < 0:
+            x += self.tile_map.width
+        if not 0 <= x < self.tile_map.width:
+            raise IndexError("tile index out of range")
+        return TILE_CHARS[self.tile_map.tiles[self.start + x]]
+
+    def __iter__(self):
+        return iter(self.text())
+
+    def text(self):
+        return self.tile_map.tiles[self.start:self.start + self.tile_map.width].translate(CHAR_TABLE).decode()
+
+class TileMap:
+    def __init__(self, width, height, fill='#', tiles=None):
+        self.width = width
+        self.height = height
+        if tiles is None:
+            tiles = bytearray([TILE_IDS[fill]]) * (width * height)
+        self.tiles = tiles
+        # Bumped on every write so caches built from the map know when to rebuild
+        self.version = 0
+        self._array = None
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [TileRow(self, row) for row in range(*y.indices(self.height))]
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("row index out of range")
+        return TileRow(self, y)
+
+    def __iter__(self):
+        return (TileRow(self, y) for y in range(self.height))
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        return TILE_CHARS[self.tiles[y * self.width + x]]
+
+    def tile_id(self, x, y):
+        return self.tiles[y * self.width + x]
+
+    def set(self, x, y, char):
+        self.tiles[y * self.width + x] = TILE_IDS[char]
+        self.version += 1
+
+    def fill_rect(self, x, y, w, h, char):
+        if w <= 0 or h <= 0:
+            return
+        tile_id = TILE_IDS[char]
+        if numpy is not None:
+            self.as_array()[y:y + h, x:x + w] = tile_id
+        elif w >= h:
+            run = bytes([tile_id]) * w
+            for row in range(y, y + h):
+                start = row * self.width + x
+                self.tiles[start:start + w] = run
+        else:
+            # Tall, narrow areas are filled one strided column slice at a time
+            column = bytes([tile_id]) * h
+            start = y * self.width + x
+            stop = (y + h) * self.width
+            for col in range(w):
+                self.tiles[start + col:stop:self.width] = column
+        self.version += 1
+
+    def fill_row(self, y, x1, x2, char):
+        self.fill_rect(min(x1, x2), y, abs(x2 - x1) + 1, 1, char)
+
+    def fill_column(self, x, y1, y2, char):
+        self.fill_rect(x, min(y1, y2), 1, abs(y2 - y1) + 1, char)
+
+    def as_array(self):
+        # A 2D NumPy view sharing memory with the tile buffer (only when NumPy is installed)
+        if self._array is None:
+            self._array = numpy.frombuffer(self.tiles, dtype=numpy.uint8).reshape(self.height, self.width)
+        return self._array
+
+    def is_passable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and PASSABLE[self.tiles[y * self.width + x]] == 1
+
+    def is_transparent(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and TRANSPARENT[self.tiles[y * self.width + x]] == 1
+
+    def cost(self, x, y):
+        return COST[self.tiles[y * self.width + x]]
+
+    def row_text(self, y):
+        return self[y].text()
+
+    def row_ids(self, y, x=0, width=None):
+        start = y * self.width + x
+        return self.tiles[start:start + (self.width - x if width is None else width)]
+
+    def active_bounds(self):
+        # The part of the map that is in memory, as (x, y, width, height): all of it
+        return (0, 0, self.width, self.height)
+
+    def load_around(self, x, y):
+        # Whole maps are always loaded; chunked worlds load their surroundings here
+        pass
+
+    def take_new_chunks(self):
+        return []
+
+    def waypoint(self, x, y, goal_x, goal_y):
+        return goal_x, goal_y
+
+    def passable_region(self, x, y, width, height):
+        if (x, y, width, height) == (0, 0, self.width, self.height):
+            return self.passable_mask()
+        return b''.join(self.tiles[row * self.width + x:row * self.width + x + width].translate(PASSABLE_TABLE)
+                        for row in range(y, y + height))
+
+    def transparent_region(self, x, y, width, height):
+        if (x, y, width, height) == (0, 0, self.width, self.height):
+            return self.transparent_mask()
+        return b''.join(self.tiles[row * self.width + x:row * self.width + x + width].translate(TRANSPARENT_TABLE)
+                        for row in range(y, y + height))
+
+    def passable_mask(self):
+        # Sliced first so tiles memory-mapped from a save (which have no translate()) work too
+        return self.tiles[:].translate(PASSABLE_TABLE)
+
+    def transparent_mask(self):
+        return self.tiles[:].translate(TRANSPARENT_TABLE)
@@ -0,0 +1,43 @@
+import heapq
+from itertools import count
+
+class Timer:
+    __slots__ = ('turn', 'callback', 'args', 'cancelled')
+
+    def __init__(self, turn, callback, args):
+        self.turn = turn
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+class TurnTimers:
+    # Callbacks keyed on the absolute turn they are due, in a min-heap, so a turn only pays for the
+    # timers that fire. Timers due on the same turn fire in the order they were scheduled.
+    def __init__(self, now=0):
+        self.now = now
+        self.heap = []
+        self.sequence = count()
+
+    def schedule(self, delay, callback, *args):
+        timer = Timer(self.now + delay, callback, args)
+        heapq.heappush(self.heap, (timer.turn, next(self.sequence), timer))
+        return timer
+
+    def cancel(self, timer):
+        # Cancelled timers stay in the heap and are skipped when they come up
+        timer.cancelled = True
+
+    def turns_left(self, timer):
+        return timer.turn - self.now
+
+    def advance(self, turn):
+        self.now = turn
+        heap = self.heap
+        while heap and heap[0][0] <= turn:
+            timer = heapq.heappop(heap)[2]
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+
+    def clear(self, now=0):
+        self.now = now
+        self.heap = []
@@ -1,5 +1,4 @@
-import curses
-from curses import wrapper
+import argparse
 import sys
 import os
 
@@ -7,7 +6,18 @@ import os
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 from classes.game import Game
-from curses import KEY_NPAGE, KEY_PPAGE
+from classes.map_generator import ALGORITHMS
+from classes.replay import InputRecorder
+
+DEFAULT_WORLD_SIZE = (1024, 1024)  # Chunked worlds without --size
+
+def map_size(text):
+    # "60x200" -> (60, 200)
+    try:
+        height, width = (int(value) for value in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HEIGHTxWIDTH, got '{text}'") from None
+    return height, width
 
 def draw(stdscr, game):
     stdscr.clear()
@@ -41,7 +51,9 @@ def draw(stdscr, game):
 
     stdscr.refresh()
 
-def main(stdscr):
+def main(stdscr, args):
+    import curses
+
     # Initialize curses
     curses.start_color()
     curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLACK)  # Default
@@ -53,7 +65,17 @@ def main(stdscr):
 
     # Initialize game
     height, width = stdscr.getmaxyx()
-    game = Game(height - 3, width, stdscr)
+    if args.load:
+        from classes.savegame import load_game
+        game = load_game(args.load, stdscr, pregenerate=True)
+    elif args.size or args.chunked:
+        # The view scrolls, so the level can be larger than the terminal
+        height, width = args.size or DEFAULT_WORLD_SIZE
+        game = Game(height, width, stdscr, seed=args.seed, pregenerate=True, chunked=args.chunked, fit_screen=False,
+                    algorithm=args.algorithm)
+    else:
+        game = Game(height - 3, width, stdscr, seed=args.seed, pregenerate=True, algorithm=args.algorithm)
+    recorder = InputRecorder(open(args.record, 'w'), game) if args.record else None
 
     while True:
         if game.character_stats_mode:
@@ -64,26 +86,46 @@ def main(stdscr):
             game.renderer.draw_backpack(stdscr)
         elif game.drop_mode:
             game.renderer.draw_drop_interface(stdscr)
+        elif game.message_log_mode:
+            game.renderer.draw_message_log(stdscr)
         elif game.debug_mode:
             game.renderer.draw_debug_menu(stdscr)
         else:
             game.renderer.draw(stdscr)
 
         key = stdscr.getch()
-        if game.debug_mode and key == 27:  # ESC key
-            game.debug_mode = False
-        elif game.inventory_mode:
-            if key in (ord('+'), ord('.'), KEY_NPAGE):  # Next page (+ key, . key, or PgDn)
-                game.inventory_page = min(game.inventory_page + 1, (len(game.player.inventory) - 1) // game.items_per_page)
-            elif key in (ord('-'), ord(','), KEY_PPAGE):  # Previous page (- key, , key, or PgUp)
-                game.inventory_page = max(0, game.inventory_page - 1)
-            elif game.handle_input(key):
-                break
-        elif game.handle_input(key):
+        finished = game.handle_input(key)
+        if recorder:
+            recorder.record(key, game)
+        if finished:
             break
 
+    if recorder:
+        recorder.close(game)
+
     curses.endwin()
     print("Thanks for playing!")
 
 if __name__ == "__main__":
-    wrapper(main)
+    parser = argparse.ArgumentParser(description="Play PRogue.")
+    parser.add_argument('--seed', help="seed for a reproducible game")
+    parser.add_argument('--load', metavar='FILE', help="continue a game saved with S")
+    parser.add_argument('--size', type=map_size, metavar='HEIGHTxWIDTH',
+                        help="level size, independent of the terminal (the view scrolls)")
+    parser.add_argument('--chunked', action='store_true',
+                        help=f"explore a world generated in chunks as you go ({DEFAULT_WORLD_SIZE[0]}x{DEFAULT_WORLD_SIZE[1]} unless --size is given)")
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='rooms',
+                        help="how levels are laid out: rooms and corridors, BSP rooms or caves")
+    parser.add_argument('--record', metavar='FILE', help="record the seed and every key for classes.replay")
+    args = parser.parse_args()
+    if args.load and args.record:
+        parser.error("recordings start from a seed, so --record cannot be combined with --load")
+    if args.load and (args.size or args.chunked):
+        parser.error("a saved game keeps its own map, so --size and --chunked cannot be combined with --load")
+    if args.load and args.algorithm != 'rooms':
+        parser.error("a saved game keeps its own map, so --algorithm cannot be combined with --load")
+    if args.chunked and args.algorithm != 'rooms':
+        parser.error("chunked worlds are always built from rooms, so --algorithm cannot be combined with --chunked")
+    # Only imported once the arguments are known to be good, so --help and usage errors stay instant
+    from curses import wrapper
+    wrapper(main, args)
@@ -0,0 +1,22 @@
+import random
+
+from classes.chunked_map import generate_world
+
+
+def test_stairs_inside_non_square_worlds():
+    for seed in range(20):
+        for width, height in ((1024, 64), (64, 1024)):
+            world, _, up_x, up_y, down_x, down_y = generate_world(width, height, random.Random(seed))
+            for x, y, char in ((up_x, up_y, '<'), (down_x, down_y, '>')):
+                assert world.in_bounds(x, y)
+                assert world.get(x, y) == char
+                # The stairs sit on a floor tile of a room
+                assert world.is_passable(x, y)
+
+
+def test_non_square_chunked_game_starts_on_its_up_stairs():
+    from classes.game import Game
+    game = Game(64, 1024, seed='wide', chunked=True, fit_screen=False)
+    assert (game.player.x, game.player.y) == (game.stairs_up_x, game.stairs_up_y)
+    assert game.map.in_bounds(game.player.x, game.player.y)
+    game.process_turn()
@@ -0,0 +1,26 @@
+import random
+
+import classes.item_loader as item_loader
+from classes.combat_system import CombatSystem
+from classes.entity import Entity
+from classes.item_loader import ItemCatalog, compile_items
+
+
+class AlwaysDrops(random.Random):
+    # Every chance roll succeeds, so a kill always reaches the item drop
+    def random(self):
+        return 0.0
+
+
+def test_kill_drops_nothing_when_no_item_can_drop(monkeypatch):
+    empty = ItemCatalog(compile_items({'consumables': [], 'equipment': []}))
+    monkeypatch.setattr(item_loader, 'catalog', empty, raising=False)
+    combat_system = CombatSystem(AlwaysDrops(1))
+    player = Entity(0, 0, '@', "Player", 100, 1000, 0)
+    for _ in range(100):
+        enemy = Entity(1, 0, 'E', "Enemy", 1, 1, 0)
+        messages = []
+        assert combat_system.player_attack_enemy(player, enemy, messages) is None
+        if enemy.health <= 0:
+            break
+    assert enemy.health <= 0
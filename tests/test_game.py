@@ -0,0 +1,31 @@
+import pytest
+
+from classes.game import Game
+from classes.map_generator import MapGenerator
+from classes.savegame import load_game, save_game
+
+
+@pytest.mark.parametrize('algorithm', ['rooms', 'bsp', 'caves'])
+def test_levels_are_laid_out_by_the_chosen_algorithm(algorithm):
+    game = Game(21, 80, seed='layout', algorithm=algorithm)
+    generator = MapGenerator(game.height, game.width, game.screen_height, game.screen_width, algorithm,
+                             game.level_rng(1))
+    tile_map, rooms, *stairs = generator.generate_level()
+    assert bytes(game.map.tiles) == bytes(tile_map.tiles)
+    assert (game.stairs_up_x, game.stairs_up_y, game.stairs_x, game.stairs_y) == tuple(stairs)
+
+
+def test_unknown_or_chunked_algorithms_are_refused():
+    with pytest.raises(ValueError):
+        Game(21, 80, seed='layout', algorithm='maze')
+    with pytest.raises(ValueError):
+        Game(64, 64, seed='layout', chunked=True, fit_screen=False, algorithm='caves')
+
+
+def test_saved_game_keeps_its_algorithm(tmp_path):
+    game = Game(21, 80, seed='layout', algorithm='caves')
+    path = str(tmp_path / 'caves.sav')
+    save_game(game, path)
+    loaded = load_game(path, use_mmap=False)
+    assert loaded.algorithm == 'caves'
+    assert bytes(loaded.build_level(2).map.tiles) == bytes(game.build_level(2).map.tiles)
@@ -0,0 +1,18 @@
+from classes.inventory import Inventory
+from classes.item_loader import catalog
+
+
+def test_positions_and_pages_follow_pickup_order():
+    inventory = Inventory()
+    items = catalog.items[:5]
+    for item in items:
+        inventory.add(item)
+    inventory.add(items[1], 2)
+    assert inventory.at(1) == (items[1], 3)
+    inventory.remove(items[1], 3)
+    assert inventory.at(1) == (items[2], 1)
+    assert inventory.page(1, 2) == [(items[3], 1), (items[4], 1)]
+    assert inventory.at(4) is None
+    inventory.add(items[1])
+    assert inventory.page(2, 2) == [(items[1], 1)]
+    assert inventory.items() == [inventory.at(index) for index in range(len(inventory))]
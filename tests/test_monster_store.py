@@ -0,0 +1,59 @@
+import pytest
+
+import classes.item_loader as item_loader
+from classes.entity import Entity
+from classes.game import Game
+from classes.monster_store import MonsterStore
+
+
+def test_boost_on_a_monster_expires_with_the_game_clock():
+    game = Game(21, 80, seed='boost', fit_screen=False)
+    monster = next(iter(game.enemies))
+    strength = monster.get_stat('strength')
+    monster.apply_temporary_boost('strength', 5, 3)
+    assert monster.get_stat('strength') == strength + 5
+    for _ in range(3):
+        game.turn_count += 1
+        game.timers.advance(game.turn_count)
+    assert monster.get_stat('strength') == strength
+    assert not monster.temporary_boosts
+
+
+def test_added_entity_keeps_its_boosts():
+    game = Game(21, 80, seed='boost', fit_screen=False)
+    entity = Entity(1, 1, 'E', "Enemy", 10, 2, 0)
+    entity.timers = game.timers
+    entity.apply_temporary_boost('dexterity', 4, 2)
+    monster = game.add_enemy(entity)
+    assert monster.get_stat('dexterity') == entity.dexterity + 4
+    game.timers.advance(2)
+    assert monster.get_stat('dexterity') == entity.dexterity
+
+
+def test_boost_without_timers_is_refused():
+    monster = MonsterStore().create(0, 0, 'E', "Enemy", 10, 2, 0)
+    with pytest.raises(ValueError):
+        monster.apply_temporary_boost('strength', 5, 3)
+
+
+def test_only_gear_changes_how_a_monster_works_out_its_stats():
+    store = MonsterStore()
+    monster = store.create(0, 0, 'E', "Enemy", 10, 3, 1)
+    monster.equipment  # Reading the empty equipment is not gear
+    assert not store.geared[monster.slot]
+    assert (monster.damage, monster.defense) == (3, 1)
+    sword = item_loader.catalog.by_slot['weapon'][0].create()
+    monster.equip_item(sword)
+    assert store.geared[monster.slot]
+    assert monster.damage == 3 + sword.stat_boost
+
+
+def test_removed_monster_keeps_its_values():
+    store = MonsterStore()
+    first = store.create(1, 2, 'E', "Enemy", 10, 3, 1)
+    second = store.create(3, 4, 'E', "Enemy", 12, 5, 2)
+    store.remove(first)
+    first.health -= 4
+    assert (first.x, first.y, first.health, first.damage) == (1, 2, 6, 3)
+    assert list(store) == [second]
+    assert first not in store
@@ -0,0 +1,20 @@
+import pytest
+
+from classes.pathfinding import AStarPathfinder, JumpPointPathfinder, Pathfinder
+from classes.tile_map import TileMap
+
+
+def test_pathfinder_needs_a_search():
+    with pytest.raises(TypeError):
+        Pathfinder()
+
+
+@pytest.mark.parametrize('pathfinder', [AStarPathfinder, JumpPointPathfinder])
+def test_searches_find_a_shortest_path(pathfinder):
+    tile_map = TileMap(12, 8)
+    tile_map.fill_rect(1, 1, 10, 6, '.')
+    tile_map.fill_column(5, 1, 5, '#')
+    path = pathfinder().find_path(tile_map, (2, 2), (9, 2))
+    assert path[0] == (2, 2) and path[-1] == (9, 2)
+    assert len(path) == 9
+    assert all(tile_map.is_passable(x, y) for x, y in path)